@@ -10,17 +10,530 @@
 #  2. Open this file and change the variable folder to the name of the folder containing your trajectories.txt file.
 #  3. Run in IDE, or run "animated_plotter.py'" in command line / terminal.
 
-import time, csv, math, os
+import time, csv, os, io, struct, zlib, multiprocessing
+from collections import deque
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 import imageio.v2 as imageio
+import trajectory_io
 
 def distance(x1, y1, x2, y2):
     return ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** (1/2)
 
+# Mover class will hold data for each mover entity on the plot
+class Mover:
+    def __init__(self, records, constant):
+        """
+        :param records: The trajectory records of this mover in time order.
+        :param constant: How much to scale the velocity and acceleration by to make them visible.
+        """
+        x, z = records["position_x"], records["position_y"]
+        orientation = records["orientation"]
+
+        self.behavior = int(records["movement_id"][0])  # steering behavior status code
+        self.x = np.array(x)  # position x (meters)
+        self.z = np.array(z)  # position z (meters)
+
+        # (multiplied by constants to increase visibility)
+        self.vXp = records["velocity_x"] * constant + x  # values to plot velocity x (meters per second)
+        self.vZp = records["velocity_y"] * constant + z  # values to plot velocity z (meters per second)
+        self.laXp = records["linear_acceleration_x"] * constant + x  # values to plot linear acceleration x
+        self.laZp = records["linear_acceleration_y"] * constant + z  # values to plot linear acceleration z
+        self.oXp = np.cos(orientation) + x  # values to plot orientation in x
+        self.oZp = np.sin(orientation) + z  # values to plot orientation in z
+
+class IncrementalFrameRenderer:
+    """
+    Renders the frames of the gif by drawing only what was added since the last frame on top of a saved copy of it,
+    instead of redrawing every line that has ever been plotted.
+
+    Lines are drawn in the order they were added, but anything with a higher zorder (spines, annotations) is drawn on
+    top of them in a full draw. So the saved copy is drawn without those and they are drawn again on top of every
+    frame. The whole figure is only redrawn when adding something changes the limits of the axes.
+    """
+    def __init__(self, figure, dpi):
+        """
+        :param figure: The figure to render. Everything is expected to be plotted on its current axes.
+        :param dpi: The dpi to render the frames at.
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.figure = figure
+        self.axes = figure.gca()
+        self.figure.set_dpi(dpi)
+        self.canvas = figure.canvas if isinstance(figure.canvas, FigureCanvasAgg) else FigureCanvasAgg(figure)
+
+        self.background = None
+        self.limits = None
+
+    def overlay(self):
+        """
+        Returns the artists that are drawn on top of lines in a full draw, in the order they are drawn.
+        """
+        return sorted(
+            [artist for artist in self.axes.get_children() if artist.get_zorder() > 2 and artist.get_visible()],
+            key=lambda artist: artist.get_zorder()
+        )
+
+    def render(self, new_artists, temporary_artists=()):
+        """
+        Renders a frame.
+
+        :param new_artists: The artists added since the last frame that stay in every following frame.
+        :param temporary_artists: The artists that are only in this frame. They should be removed after rendering.
+        :return: The frame as an RGBA array.
+        """
+        # Accessing viewLim autoscales the axes to everything that has been added, just like a full draw does
+        limits = tuple(self.axes.viewLim.bounds)
+        overlay = self.overlay()
+
+        if limits != self.limits or self.background is None:
+            self.limits = limits
+
+            # Everything but the overlay and this frame's temporary artists is drawn and saved
+            hidden = overlay + list(temporary_artists)
+            for artist in hidden:
+                artist.set_visible(False)
+            self.canvas.draw()
+            for artist in hidden:
+                artist.set_visible(True)
+        else:
+            self.canvas.restore_region(self.background)
+            for artist in new_artists:
+                self.axes.draw_artist(artist)
+
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+        for artist in list(temporary_artists) + overlay:
+            self.axes.draw_artist(artist)
+
+        return np.array(self.canvas.buffer_rgba())
+
+class GifStreamWriter:
+    """
+    Writes an animated gif one frame at a time, so only the current frame is ever held in memory.
+
+    Each frame is encoded by Pillow as a single image gif, and its image data is copied into the animation with its
+    palette moved into a local color table.
+    """
+    def __init__(self, file_path, fps=10, palette_size=None):
+        """
+        :param file_path: The gif file to write.
+        :param fps: The frames per second of the animation.
+        :param palette_size: If set, every frame is quantized down to this many colors, which makes the gif smaller.
+            Otherwise frames are converted to a palette the same way Pillow does when saving a gif.
+        """
+        self.file = open(file_path, "wb")
+        self.delay = round(100 / fps)  # In hundredths of a second
+        self.palette_size = palette_size
+        self.frames = 0
+
+    def append(self, frame):
+        from PIL import Image
+
+        image = Image.fromarray(frame[:, :, :3])
+        if self.palette_size:
+            image = image.quantize(self.palette_size)
+
+        encoded = io.BytesIO()
+        image.save(encoded, "GIF")
+        data = encoded.getvalue()
+
+        # The logical screen descriptor is followed by the global color table, if there is one
+        screen_descriptor = data[6:13]
+        flags = screen_descriptor[4]
+        color_table = data[13:13 + 3 * 2 ** ((flags & 0x07) + 1)] if flags & 0x80 else b""
+
+        # Skipping over any extensions to get to the image descriptor
+        position = 13 + len(color_table)
+        while data[position] == 0x21:
+            position += 2
+            while data[position]:
+                position += data[position] + 1
+            position += 1
+
+        image_descriptor = bytearray(data[position:position + 10])
+        if color_table:
+            image_descriptor[9] = 0x80 | (image_descriptor[9] & 0x40) | (flags & 0x07)
+
+        if self.frames == 0:
+            # Header without a global color table, followed by the extension that makes the gif loop forever
+            self.file.write(b"GIF89a" + screen_descriptor[:4] + bytes([flags & 0x70]) + screen_descriptor[5:])
+            self.file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+        # A graphic control extension for the frame delay, then the frame itself without Pillow's trailer
+        self.file.write(b"\x21\xf9\x04\x08" + struct.pack("<H", self.delay) + b"\x00\x00")
+        self.file.write(bytes(image_descriptor) + color_table + data[position + 10:-1])
+        self.frames += 1
+
+    def close(self):
+        self.file.write(b";")
+        self.file.close()
+
+class APNGStreamWriter:
+    """
+    Writes an animated png one frame at a time. The amount of frames is filled in when the writer is closed.
+    """
+    def __init__(self, file_path, fps=10):
+        self.file = open(file_path, "wb")
+        self.fps = fps
+        self.frames = 0
+        self.sequence = 0
+        self.animation_control = None
+
+    def write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack(">I", len(data)) + chunk_type + data)
+        self.file.write(struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+    def append(self, frame):
+        frame = np.ascontiguousarray(frame[:, :, :3])
+        height, width = frame.shape[:2]
+
+        if self.frames == 0:
+            self.file.write(b"\x89PNG\r\n\x1a\n")
+            self.write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            self.animation_control = self.file.tell()
+            self.write_chunk(b"acTL", struct.pack(">II", 0, 0))
+
+        # Every row of the image starts with the filter type, which is always 0 (none)
+        rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+        rows[:, 1:] = frame.reshape(height, -1)
+        compressed = zlib.compress(rows.tobytes())
+
+        self.write_chunk(b"fcTL", struct.pack(
+            ">IIIIIHHBB", self.sequence, width, height, 0, 0, 1, self.fps, 0, 0
+        ))
+        self.sequence += 1
+        if self.frames == 0:
+            self.write_chunk(b"IDAT", compressed)
+        else:
+            self.write_chunk(b"fdAT", struct.pack(">I", self.sequence) + compressed)
+            self.sequence += 1
+        self.frames += 1
+
+    def close(self):
+        self.write_chunk(b"IEND", b"")
+        if self.animation_control is not None:
+            self.file.seek(self.animation_control)
+            self.write_chunk(b"acTL", struct.pack(">II", self.frames, 0))
+        self.file.close()
+
+class AnimationWriter:
+    """
+    Streams frames straight from the canvas into one or more animation files.
+    """
+    def __init__(self, file_name, formats=("gif",), fps=10, palette_size=None):
+        """
+        :param file_name: The path of the animation files without an extension.
+        :param formats: Any of "gif", "mp4" and "apng". mp4 requires the imageio-ffmpeg package.
+        :param fps: The frames per second of the animations.
+        :param palette_size: Passed to GifStreamWriter.
+        """
+        self.writers = []
+        for animation_format in formats:
+            if animation_format == "gif":
+                self.writers.append(GifStreamWriter(f"{file_name}.gif", fps, palette_size))
+            elif animation_format == "apng":
+                self.writers.append(APNGStreamWriter(f"{file_name}.png", fps))
+            elif animation_format == "mp4":
+                writer = imageio.get_writer(f"{file_name}.mp4", fps=fps, macro_block_size=1)
+                writer.append = lambda frame, writer=writer: writer.append_data(np.ascontiguousarray(frame[:, :, :3]))
+                self.writers.append(writer)
+            else:
+                raise ValueError(f"Unknown animation format \"{animation_format}\"")
+
+    def append(self, frame):
+        for writer in self.writers:
+            writer.append(frame)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+
+def plot_segments(segments, **kwargs):
+    """
+    Plots many separate line segments on the current axes as a single LineCollection.
+    :param segments: An (n, 2, 2) array of the start and end point of each segment.
+    :param kwargs: Passed on to LineCollection, such as color, linestyle and linewidth.
+    :return: The LineCollection.
+    """
+    axes = plt.gca()
+    collection = axes.add_collection(LineCollection(segments, **kwargs))
+    # Older versions of matplotlib only update the data limits when a collection is added
+    axes.autoscale_view()
+    return collection
+
+
+class Scene:
+    """
+    Everything that is plotted for a run. This is sent to every process that renders frames, so it only holds data.
+    """
+    def __init__(
+            self, movers, time_entries, paths_data, lines_data, points_data, extents,
+            labels, point_colors, line_thickness, do_orientation, frame_step
+    ):
+        """
+        :param frame_step: Only every frame_step-th tick (and the last one) becomes a frame. None if there are no frames.
+        """
+        self.movers = list(movers.values())
+        self.time_entries = time_entries
+        self.paths_data = paths_data
+        self.lines_data = lines_data
+        self.points_data = points_data
+        self.extents = extents
+        self.labels = labels
+        self.point_colors = point_colors
+        self.line_thickness = line_thickness
+        self.do_orientation = do_orientation
+        self.frame_step = frame_step
+
+    def is_frame(self, t):
+        if self.frame_step is None:
+            return False
+        return t % self.frame_step == 0 or t == len(self.time_entries) - 1
+
+    def frame_count(self):
+        return sum(1 for t in range(len(self.time_entries)) if self.is_frame(t))
+
+    def chunks(self, chunk_frames):
+        """
+        Splits the timeline up into ranges of ticks with chunk_frames frames in each.
+        :return: A list of (start, stop) tuples, where start is the first tick that is a frame and stop is one past the
+            last one.
+        """
+        frames = [t for t in range(len(self.time_entries)) if self.is_frame(t)]
+        return [
+            (frames[i], frames[min(i + chunk_frames, len(frames)) - 1] + 1)
+            for i in range(0, len(frames), chunk_frames)
+        ]
+
+    def plot_background(self):
+        """
+        Plots everything that is in the figure from the start: the axes, paths, walls and starting positions.
+        """
+        xLineX = self.extents
+        xLineY = [0, 0]
+        yLineX = [0, 0]
+        yLineY = self.extents
+
+        # add dashed grey lines
+        plt.plot(xLineX, xLineY, color='grey', linestyle='dashed', linewidth=1)
+        plt.plot(yLineX, yLineY, color='grey', linestyle='dashed', linewidth=1)
+
+        # ------------------------------------------------------------------------------------------- Path Rendering ---
+        # Every segment of every path is drawn by a single collection
+        path_segments = [
+            (path_points[i], path_points[i + 1])
+            for path_points in self.paths_data for i in range(len(path_points) - 1)
+        ]
+        if path_segments:
+            plot_segments(np.array(path_segments, dtype=np.float64), color='grey', linestyle='dashed', linewidth=1)
+        # ------------------------------------------------------------------------------------------- Line Rendering ---
+        if self.lines_data:
+            plot_segments(np.array(self.lines_data, dtype=np.float64), color='black', linewidth=1)
+
+        for m in self.movers:
+            # Plot labels for steering behavior type
+            label = ""
+            if m.behavior in self.labels:
+                label = self.labels[m.behavior]
+
+            # This puts the steering behavior label on the graph
+            plt.annotate(label, color='red', xy=(m.x[0] + 2, m.z[0] - 2))
+
+            # add red dots to the start and end of each mover's trail
+            plt.plot(m.x[0], m.z[0], color='red', marker='o', markerfacecolor='red', markersize=3)  # mark start
+
+    def plot_tick(self, t):
+        """
+        Plots the trails of every mover for tick t.
+        :return: The artists that were added.
+        """
+        new_artists = []
+        line_thickness = self.line_thickness
+        for mover in self.movers:
+            x_pos, z_pos = mover.x[t], mover.z[t]
+
+            # Velocity Line
+            i = [x_pos, mover.vXp[t]]  # current x, current x + x velocity
+            j = [z_pos, mover.vZp[t]]  # current z, current z + z velocity
+
+            new_artists += plt.plot(i, j, color='#5beb34', linewidth=line_thickness)  # green
+
+            # Linear Acceleration
+            i = [x_pos, mover.laXp[t]]  # current x, current x + x velocity
+            j = [z_pos, mover.laZp[t]]  # current z, current z + z velocity
+
+            new_artists += plt.plot(i, j, color='blue', linewidth=line_thickness)
+
+            # Orientation
+            if self.do_orientation:
+                i = [x_pos, mover.oXp[t]]  # current x, current x + x velocity
+                j = [z_pos, mover.oZp[t]]  # current z, current z + z velocity
+
+                new_artists += plt.plot(i, j, color='yellow', linewidth=line_thickness)
+
+            # Position
+            if t + 1 < len(mover.x):
+                i = [x_pos, mover.x[t + 1]]  # current x, next x
+                j = [z_pos, mover.z[t + 1]]  # current z, next z
+
+                new_artists += plt.plot(i, j, color='red', linewidth=line_thickness)  # red
+        return new_artists
+
+    def plot_trails(self):
+        """
+        Plots the trails of every mover for the whole timeline at once, with a collection per kind of line.
+
+        This is what the static plot uses. The lines look the same as plotting every tick with plot_tick, except that
+        each kind of line is drawn on top of the kinds before it instead of in the order of the ticks.
+        """
+        if not self.movers:
+            return
+
+        x = np.concatenate([mover.x for mover in self.movers])
+        z = np.concatenate([mover.z for mover in self.movers])
+
+        kinds = [("vXp", "vZp", '#5beb34'), ("laXp", "laZp", 'blue')]  # green velocity and blue linear acceleration
+        if self.do_orientation:
+            kinds.append(("oXp", "oZp", 'yellow'))
+
+        for end_x, end_z, color in kinds:
+            end_x = np.concatenate([getattr(mover, end_x) for mover in self.movers])
+            end_z = np.concatenate([getattr(mover, end_z) for mover in self.movers])
+            plot_segments(np.stack((x, z, end_x, end_z), axis=-1).reshape(-1, 2, 2), color=color,
+                          linewidth=self.line_thickness)
+
+        # Position, from each tick to the next one of the same mover
+        segments = np.concatenate([
+            np.stack((mover.x[:-1], mover.z[:-1], mover.x[1:], mover.z[1:]), axis=-1).reshape(-1, 2, 2)
+            for mover in self.movers
+        ])
+        plot_segments(segments, color='red', linewidth=self.line_thickness)
+
+    def plot_points(self, t):
+        """
+        Plots the temporary points of tick t, which are only in its frame.
+        :return: The artists that were added. They should be removed once the frame is rendered.
+        """
+        temporary_artists = []
+        if self.time_entries[t] in self.points_data:
+            points = self.points_data[self.time_entries[t]]
+            for i, point in enumerate(points):
+                temporary_artists += plt.plot(
+                    point[0], point[1],
+                    color=self.point_colors[i], marker='o', markerfacecolor='red', markersize=3
+                )
+        return temporary_artists
+
+
+class Timeline:
+    """
+    A figure of a Scene that the ticks are plotted onto in order, rendering frames along the way.
+    """
+    def __init__(self, scene, dpi=50):
+        """
+        Creates a new figure with the background of the scene.
+        :param dpi: The dpi to render the frames at.
+        """
+        plt.figure(figsize=(6, 6))
+        scene.plot_background()
+
+        self.scene = scene
+        self.figure = plt.gcf()
+        self.dpi = dpi
+        self.renderer = None
+
+        self.tick = 0  # The next tick to plot
+        self.new_artists = []  # What has been plotted since the last rendered frame
+
+    def frames(self, start=0, stop=None):
+        """
+        Plots every tick up to stop and yields the frames from start on.
+
+        The frames before start are plotted and removed without being rendered, so the axes end up with exactly the
+        same limits as if they had been.
+        :param start: The first tick to render a frame for. Ticks can't be plotted twice, so it can't be before the
+            ticks that were already plotted.
+        :param stop: One past the last tick to plot. Defaults to the end of the timeline.
+        """
+        if stop is None:
+            stop = len(self.scene.time_entries)
+        if start < self.tick:
+            raise ValueError(f"Tick {start} has already been plotted!")
+
+        for t in range(self.tick, stop):
+            self.new_artists += self.scene.plot_tick(t)
+            self.tick = t + 1
+
+            if self.scene.is_frame(t):
+                temporary_artists = self.scene.plot_points(t)
+                frame = None
+                if t >= start:
+                    if self.renderer is None:
+                        self.renderer = IncrementalFrameRenderer(self.figure, self.dpi)
+
+                    # Frames go straight from the canvas into the animation files
+                    frame = self.renderer.render(self.new_artists, temporary_artists)
+                    self.new_artists = []
+
+                for thing in temporary_artists:
+                    thing.remove()
+
+                if frame is not None:
+                    yield frame
+
+
+# The Timeline of a process in the pool that renders frames
+_worker_timeline = None
+
+
+def _start_frame_worker(scene):
+    global _worker_timeline
+    plt.switch_backend("agg")
+    _worker_timeline = Timeline(scene)
+
+
+def _render_frame_chunk(chunk):
+    # The pool hands out chunks in order, so each worker only ever moves forward through the timeline
+    start, stop = chunk
+    return list(_worker_timeline.frames(start, stop))
+
+
+def load_trajectories(file_name, constant=3):
+    """
+    Loads a trajectories.txt or trajectories.npy file for plotting.
+
+    :param file_name: The path of the trajectories file.
+    :param constant: How much to scale the velocity and acceleration by to make them visible.
+    :return: (movers, time_entries), where movers maps mover ids to Movers and time_entries is every distinct time.
+    """
+    times, records_by_mover = trajectory_io.split_by_mover(trajectory_io.read_trajectories(file_name))
+
+    movers = {mover_id: Mover(records, constant) for mover_id, records in records_by_mover.items()}
+    return movers, times.tolist()
+
 # Change this to data file name
-def render(program_name, create_gif=True, extents=100):
+def render(
+        program_name, create_gif=True, extents=100, trajectory_format="txt",
+        animation_formats=("gif",), frame_step=1, fps=10, palette_size=None, workers=None, chunk_frames=None
+):
+    """
+    :param trajectory_format: "txt" to read trajectories.txt, or "npy" to read the binary trajectories.npy.
+    :param animation_formats: The formats to write image_files/simulation in when create_gif is set, see AnimationWriter.
+    :param frame_step: Only every frame_step-th tick (and the last one) becomes a frame, for long runs.
+    :param fps: The frames per second of the animation.
+    :param palette_size: If set, gif frames are quantized down to this many colors.
+    :param workers: How many processes render frames at once. Defaults to the number of cores, 1 renders everything
+        in this process.
+    :param chunk_frames: How many frames a worker renders at a time, 8 by default. At most 2 chunks per worker are
+        handed out before their frames are written, so up to 2 * workers * chunk_frames frames are held in memory no
+        matter how long the run is.
+    """
     folder_name = f"output_data/{program_name}"
-    frame_name = f"{folder_name}/trajectories.txt"
+    frame_name = f"{folder_name}/trajectories.{trajectory_format}"
     paths_file = f"{folder_name}/paths.txt"
     points_file = f"{folder_name}/points.txt"
 
@@ -31,7 +544,9 @@ def render(program_name, create_gif=True, extents=100):
         6: "Seek",
         7: "Flee",
         8: "Arrive",
-        11: "Follow Path"
+        11: "Follow Path",
+        12: "Follow Flow Field",
+        13: "Obstacle Avoidance"
     }
     point_colors = [
         "red",
@@ -48,53 +563,11 @@ def render(program_name, create_gif=True, extents=100):
     start_time = time.time()
 
     # ----------------------------------------------------------------------------------- Trajectory Data Processing ---
-    # Mover class will hold data for each mover entity on the plot
-    class Mover:
-        def __init__(self, behavior):
-            self.behavior = behavior  # steering behavior status code
-            self.z = []  # position z (meters)
-            self.x = []  # position x (meters)
-            self.vXp = []  # values to plot velocity x (meters per second)
-            self.vZp = []  # values to plot velocity z (meters per second)
-            self.laXp = []  # values to plot linear acceleration x (meters per second per second)
-            self.laZp = []  # values to plot linear acceleration z (meters per second per second)
-            self.oXp = []  # values to plot orientation in x
-            self.oZp = []  # values to plot orientation in z
-
-    movers = {}  # create dictionary to store different movers
-    time_entries = [0.0]
     try:
-        with open(frame_name, 'r') as csvfile:
-            csvreader = csv.reader(csvfile)
-
-            for row in csvreader:
-                if float(row[0]) != time_entries[-1]:
-                    time_entries.append(float(row[0]))
-
-                # If we find a new mover
-                if row[1] not in movers:
-                    movers[row[1]] = Mover(int(row[9]))  # add a new one to the dictionary
-
-                # Grabbing the Mover object from the dict
-                m = movers[row[1]]
-
-                # Position Data
-                m.x.append(float(row[2]))  # Position Y
-                m.z.append(float(row[3]))  # Position Z
-
-                # Velocity Data
-                # (multiplied by constants to increase visibility)
-                m.vXp.append((float(row[4]) * constant) + float(row[2]))  # Velocity X
-                m.vZp.append((float(row[5]) * constant) + float(row[3]))  # Velocity Z
-
-                # Acceleration Data
-                m.laXp.append((float(row[6])) * constant + float(row[2]))  # Linear Acceleration X
-                m.laZp.append((float(row[7])) * constant + float(row[3]))  # Linear Acceleration Z
-
-                m.oXp.append((math.cos(float(row[8]))) + float(row[2]))  # Orientation X
-                m.oZp.append((math.sin(float(row[8]))) + float(row[3]))  # Orientation Z
+        movers, time_entries = load_trajectories(frame_name, constant)
     except FileNotFoundError:
-        print(f"Trajectories data file could not be found at \"{points_file}\"")
+        movers, time_entries = {}, [0.0]
+        print(f"Trajectories data file could not be found at \"{frame_name}\"")
 
     # ----------------------------------------------------------------------------------------- Path Data Processing ---
     paths_data = []
@@ -156,112 +629,51 @@ def render(program_name, create_gif=True, extents=100):
     plt.xlim(*extents)
     plt.ylim(*extents)
 
-    xLineX = extents
-    xLineY = [0, 0]
-    yLineX = [0, 0]
-    yLineY = extents
-    plt.figure(figsize=(6, 6))
-
-    # add dashed grey lines
-    plt.plot(xLineX, xLineY, color='grey', linestyle='dashed', linewidth=1)
-    plt.plot(yLineX, yLineY, color='grey', linestyle='dashed', linewidth=1)
-
-    # ----------------------------------------------------------------------------------------------- Path Rendering ---
-    for path_points in paths_data:
-        lengths = []
-        for i in range(len(path_points) - 1):
-            x1, y1 = path_points[i][0], path_points[i][1]
-            x2, y2 = path_points[i + 1][0], path_points[i + 1][1]
-            plt.plot(
-                [x1, x2], [y1, y2],
-                color='grey', linestyle='dashed', linewidth=1
-            )
-            lengths.append(distance(x1, y1, x2, y2))
-
-        total_length = sum(lengths)
-        sum_of_lengths = 0
-        for i, length in enumerate(lengths):
-            sum_of_lengths += length / total_length
-            point = path_points[i + 1]
-            # plt.annotate(f"{sum_of_lengths:.2f}", color='grey', xy=(point[0] - 10, point[1] + 10))
-            # plt.plot(*path_points[i], color='grey')
-    # ----------------------------------------------------------------------------------------------- Line Rendering ---
-    for line in lines_data:
-        plt.plot([line[0][0], line[1][0]], [line[0][1], line[1][1]], xLineY, color='black', linewidth=1)
-
-    for mov in movers:
-        m = movers[mov]
-
-        # Plot labels for steering behavior type
-        label = ""
-        if m.behavior in labels:
-            label = labels[m.behavior]
-
-        # This puts the steering behavior label on the graph
-        plt.annotate(label, color='red', xy=(m.x[0] + 2, m.z[0] - 2))
+    scene = Scene(
+        movers, time_entries, paths_data, lines_data, points_data, extents,
+        labels, point_colors, line_thickness, do_orientation, frame_step if create_gif else None
+    )
+    timeline = Timeline(scene)
 
-        # add red dots to the start and end of each mover's trail
-        plt.plot(m.x[0], m.z[0], color='red', marker='o', markerfacecolor='red', markersize=3)  # mark start position
-
-    if create_gif and "frames" not in os.listdir():
-        print("Generated a frames folder.")
-        os.mkdir("frames")
-
-    movers_list = list(movers.values())
-    frame_names = []
+    writer = None
+    frame_count = scene.frame_count()
     if create_gif:
-        print(f"Generating {len(time_entries)} frames.")
+        if "image_files" not in os.listdir():
+            print("Created image_files")
+            os.mkdir("image_files")
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        print(f"Generating {frame_count} frames.")
+        writer = AnimationWriter("image_files/simulation", animation_formats, fps, palette_size)
     start_time = time.time()
 
     # ----------------------------------------------------------------------------------------- Trajectory Rendering ---
-    for t in range(len(time_entries)):
-        for u in range(len(movers_list)):
-            mover = movers_list[u]
-
-            x_pos, z_pos = mover.x[t], mover.z[t]
-
-            # Velocity Line
-            i = [x_pos, mover.vXp[t]]  # current x, current x + x velocity
-            j = [z_pos, mover.vZp[t]]  # current z, current z + z velocity
-
-            plt.plot(i, j, color='#5beb34', linewidth=line_thickness)  # green
-
-            # Linear Acceleration
-            i = [x_pos, mover.laXp[t]]  # current x, current x + x velocity
-            j = [z_pos, mover.laZp[t]]  # current z, current z + z velocity
-
-            plt.plot(i, j, color='blue', linewidth=line_thickness)
-
-            # Orientation
-            if do_orientation:
-                i = [x_pos, mover.oXp[t]]  # current x, current x + x velocity
-                j = [z_pos, mover.oZp[t]]  # current z, current z + z velocity
-
-                plt.plot(i, j, color='yellow', linewidth=line_thickness)
-
-            # Position
-            if t + 1 < len(mover.x):
-                i = [x_pos, mover.x[t + 1]]  # current x, next x
-                j = [z_pos, mover.z[t + 1]]  # current z, next z
-
-                plt.plot(i, j, color='red', linewidth=line_thickness)  # red
-
-        if create_gif:
-            remove_from_final = []
-            if time_entries[t] in points_data:
-                points = points_data[time_entries[t]]
-                for i, point in enumerate(points):
-                    remove_from_final += plt.plot(
-                        point[0], point[1],
-                        color=point_colors[i], marker='o', markerfacecolor='red', markersize=3
-                    )
-
-            frame_name = f"frames/frame_{t:03}.png"
-            plt.savefig(frame_name, dpi=50)
-            frame_names.append(frame_name)
-
-            for thing in remove_from_final:
-                thing.remove()
+    if create_gif and workers > 1 and frame_count > 1:
+        chunks = scene.chunks(chunk_frames or 8)
+        workers = min(workers, len(chunks))
+
+        # Each worker plots the scene on its own figure. Only a few chunks are handed out ahead of the one that is
+        # being written, so chunks that finish early can't pile up in memory while they wait for their turn.
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=_start_frame_worker, initargs=(scene,)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                if len(pending) == 2 * workers:
+                    for frame in pending.popleft().get():
+                        writer.append(frame)
+                pending.append(pool.apply_async(_render_frame_chunk, (chunk,)))
+            while pending:
+                for frame in pending.popleft().get():
+                    writer.append(frame)
+
+        # The figure that is shown at the end still needs the trails plotted on it
+        scene.plot_trails()
+    elif create_gif:
+        for frame in timeline.frames():
+            writer.append(frame)
+    else:
+        scene.plot_trails()
 
     print(f"Finished generating frames in {time.time() - start_time:.3f}s")
 
@@ -284,30 +696,10 @@ def render(program_name, create_gif=True, extents=100):
         # plt.plot(m.x, m.z, color='red', linewidth=1)
 
     if create_gif:
-        print("Generating gif from frames.")
-        start_time = time.time()
-        # Build GIF
-        if "frames" in os.listdir():
-            if "image_files" not in os.listdir():
-                print("Created image_files")
-                os.mkdir("image_files")
-            with imageio.get_writer('image_files/simulation.gif', mode='I') as writer:
-
-                for i, frame_name in enumerate(frame_names):
-                    print(f"{i/len(frame_names) * 100:0.2f}% complete.")
-
-                    image = imageio.imread(frame_name)
-                    writer.append_data(image)
-                    os.remove(frame_name)
-
-            print(f"Finished generating gif in {time.time() - start_time:.3f}s")
-
-        else:
-            print("Couldn't find frames directory.")
+        writer.close()
     else:
         plt.savefig("image_files/outputPlot.png", dpi=200)
     plt.show()
 
-
 if __name__ == '__main__':
     render("program_2", False)
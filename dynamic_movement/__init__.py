@@ -2,5 +2,8 @@
 from dynamic_movement.vector import Vector
 from dynamic_movement.mover import Mover, Target
 from dynamic_movement.simulation import Simulation
-from dynamic_movement.geometry import Path
+from dynamic_movement.geometry import Path, WallSegments, simplify_path
+from dynamic_movement.maze import Maze
+from dynamic_movement.pathfinding import PathFinder, FlowField
+from dynamic_movement.hierarchy import ClusterGraph
 from dynamic_movement.behavior import *
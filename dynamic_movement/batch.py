@@ -0,0 +1,405 @@
+"""
+A structure-of-arrays engine for simulating a large number of Movers at once.
+
+All of the physics state of the Movers is kept in contiguous NumPy arrays so that a physics step is a handful of
+vectorized operations instead of a Python loop. The Movers themselves become views over their row of the arrays, so
+behaviors and output code can keep using the regular Mover API.
+
+This module requires NumPy, which is why it isn't imported by the package by default.
+"""
+import numpy as np
+
+from dynamic_movement.mover import Mover, is_integral
+from dynamic_movement.behavior import Continue, Seek, Flee, Arrive, FollowPath, FollowFlowField
+
+
+class MoverBatch:
+    """
+    Holds the state of many Movers in contiguous arrays and advances all of them in a single vectorized physics step.
+
+    Vector state is stored in (n, 2) arrays and scalar state in (n,) arrays, where row i belongs to movers[i].
+    """
+    def __init__(self, movers):
+        """
+        Copies the state of the Movers into arrays and binds every Mover to its row.
+
+        :param movers: The Movers to take ownership of.
+        """
+        self.movers: [Mover] = list(movers)
+        count = len(self.movers)
+
+        for name in Mover.batched_vectors:
+            setattr(self, name, np.zeros((count, 2), dtype=np.float64))
+        for name in Mover.batched_scalars:
+            setattr(self, name, np.zeros(count, dtype=np.float64))
+        for name in Mover.batched_flags:
+            setattr(self, name, np.zeros(count, dtype=np.bool_))
+
+        # Which values are still ints on the Movers. Unbound Movers keep ints until something computes a new value,
+        # and ints are written to trajectories.txt without any decimals, so these are handed back to them as ints.
+        self.integral = {name: np.zeros((count, 2), dtype=np.bool_) for name in Mover.batched_vectors}
+        self.integral.update({name: np.zeros(count, dtype=np.bool_) for name in Mover.batched_scalars})
+
+        for index, mover in enumerate(self.movers):
+            for name in Mover.batched_vectors:
+                getattr(self, name)[index] = getattr(mover, name).as_tuple()
+                self.integral[name][index] = is_integral(getattr(mover, name), True)
+            for name in Mover.batched_scalars:
+                getattr(self, name)[index] = getattr(mover, name)
+                self.integral[name][index] = is_integral(getattr(mover, name))
+            for name in Mover.batched_flags:
+                getattr(self, name)[index] = getattr(mover, name)
+
+            mover.bind(self, index)
+
+        # Scratch space so that a physics step doesn't allocate new arrays
+        self._scratch = np.zeros((count, 2), dtype=np.float64)
+        self._speed = np.zeros(count, dtype=np.float64)
+
+        self.ids = np.array([mover.id for mover in self.movers], dtype=np.int64)
+        self.movement_ids = np.zeros(count, dtype=np.int32)
+
+        self.groups: [SteeringGroup] = []
+        self.ungrouped: [Mover] = []
+        self.group_behaviors()
+
+    def __len__(self):
+        return len(self.movers)
+
+    def release(self):
+        """
+        Copies the state back onto the Movers and their behaviors and unbinds them from this batch.
+        """
+        for group in self.groups:
+            group.write_back()
+        for mover in self.movers:
+            mover.unbind()
+        self.movers = []
+
+    def group_behaviors(self, rows=None):
+        """
+        Sorts the Movers into SteeringGroups by behavior id so that each group can be steered with one kernel call.
+
+        Movers whose behavior has no vectorized kernel are kept in self.ungrouped and steered one at a time.
+        This must be called again if any Mover's behavior is changed.
+        :param rows: The rows of the Movers that steer() should steer, such as the shard of a worker process. Defaults
+            to all of them.
+        """
+        for group in self.groups:
+            group.write_back()
+
+        members = {}
+        self.ungrouped = []
+        for index in range(len(self.movers)) if rows is None else rows:
+            mover = self.movers[index]
+            behavior = mover.movement_behavior
+            if behavior is None:
+                raise ValueError("Movement Behavior not Assigned!")
+            self.movement_ids[index] = behavior.id
+
+            # Subclasses may share an id or override execute, so only the exact behavior classes are vectorized
+            if behavior.id in STEERING_KERNELS and type(behavior) is STEERING_KERNELS[behavior.id][0]:
+                members.setdefault(behavior.id, []).append(index)
+            else:
+                self.ungrouped.append(mover)
+
+        self.groups = [SteeringGroup(self, behavior_id, indices) for behavior_id, indices in members.items()]
+
+    def use_arrays(self, arrays):
+        """
+        Points the state of the batch at other arrays, such as a buffer in shared memory. The Movers see the new
+        arrays right away.
+        :param arrays: A dict of arrays with the same shapes as the batch's, keyed by the names of the state they hold.
+        """
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    def mark_computed(self, names, rows=slice(None)):
+        """
+        Marks state that the batch computed, which the Movers no longer hand back as ints.
+        :param names: The names of the state.
+        :param rows: The rows that were computed. Defaults to all of them.
+        """
+        for name in names:
+            self.integral[name][rows] = False
+
+    def steer(self, delta):
+        """
+        Executes the movement behavior of every Mover and stores the resulting accelerations.
+
+        Every behavior reads the state from before this tick, since nothing moves until physics_tick is called.
+        :param delta: The amount of time during the step.
+        """
+        for group in self.groups:
+            group.kernel(self, group, delta)
+
+        for mover in self.ungrouped:
+            mover.steer(delta)
+
+    def get_records(self, time):
+        """
+        Builds the trajectory records of every Mover at the current moment without going through the Movers.
+        :param time: The time of the simulation at this moment.
+        :return: An array with the dtype trajectory_io.TRAJECTORY_DTYPE.
+        """
+        from trajectory_io import TRAJECTORY_DTYPE
+
+        records = np.empty(len(self.movers), dtype=TRAJECTORY_DTYPE)
+        records["time"] = time
+        records["id"] = self.ids
+        records["position_x"], records["position_y"] = self.position[:, 0], self.position[:, 1]
+        records["velocity_x"], records["velocity_y"] = self.velocity[:, 0], self.velocity[:, 1]
+        records["linear_acceleration_x"] = self.linear_acceleration[:, 0]
+        records["linear_acceleration_y"] = self.linear_acceleration[:, 1]
+        records["orientation"] = self.orientation
+        records["movement_id"] = self.movement_ids
+        records["collision_state"] = self.collision_state
+        return records
+
+    def physics_tick(self, delta, rows=slice(None), next_state=None):
+        """
+        Performs a step of physics for every Mover in the batch.
+
+        This mirrors Mover.physics_tick, including clamping the velocity to each Mover's max_speed.
+        :param delta: The time step between ticks.
+        :param rows: A slice of the rows to step. Defaults to all of them.
+        :param next_state: A dict of arrays like the ones of the batch to write the new position, velocity, orientation
+            and rotation of the rows into, which leaves the batch's own arrays alone. By default the batch is updated in
+            place.
+        """
+        if next_state is None:
+            next_state = {name: getattr(self, name) for name in ("position", "velocity", "orientation", "rotation")}
+        position, velocity = next_state["position"][rows], next_state["velocity"][rows]
+        scratch, speed, max_speed = self._scratch[rows], self._speed[rows], self.max_speed[rows]
+
+        np.multiply(self.velocity[rows], delta, out=scratch)
+        np.add(self.position[rows], scratch, out=position)
+        np.add(self.orientation[rows], self.rotation[rows] * delta, out=next_state["orientation"][rows])
+
+        np.multiply(self.linear_acceleration[rows], delta, out=scratch)
+        np.add(self.velocity[rows], scratch, out=velocity)
+        np.add(self.rotation[rows], self.angular_acceleration[rows] * delta, out=next_state["rotation"][rows])
+
+        # Clamping the speed of every Mover that has a max_speed and is going faster than it
+        np.multiply(velocity, velocity, out=scratch)
+        np.sqrt(scratch.sum(axis=1, out=speed), out=speed)
+        too_fast = np.flatnonzero((max_speed != 0) & (speed > max_speed))
+        if too_fast.size:
+            velocity[too_fast] = velocity[too_fast] / speed[too_fast, None] * max_speed[too_fast, None]
+
+        self.mark_computed(("position", "velocity", "orientation", "rotation"), rows)
+
+
+class SteeringGroup:
+    """
+    The Movers of a MoverBatch that share a vectorized behavior, along with the parameters of each of their behaviors.
+    """
+    def __init__(self, batch, behavior_id, indices):
+        """
+        :param batch: The MoverBatch the Movers belong to.
+        :param behavior_id: The id of the behavior every Mover in the group has.
+        :param indices: The rows of the batch that belong to the Movers in this group.
+        """
+        self.behavior_id = behavior_id
+        self.kernel = STEERING_KERNELS[behavior_id][1]
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.behaviors = [batch.movers[index].movement_behavior for index in indices]
+
+        # Targets that are in the batch are read straight out of its position array, any others are read every tick
+        rows = {id(mover): index for index, mover in enumerate(batch.movers)}
+        self.target_indices = np.array(
+            [rows.get(id(behavior.target), -1) for behavior in self.behaviors], dtype=np.intp
+        )
+        self.external_targets = np.flatnonzero(self.target_indices == -1)
+
+        self._parameters = {}
+        self._state = {}
+
+        # Behaviors that follow a path or a flow field are split up further by which one they follow, so that each one
+        # is only queried once for all of the Movers following it
+        self.paths = self.group_by("path")
+        self.flow_fields = self.group_by("flow_field")
+
+    def group_by(self, name):
+        """
+        Splits the behaviors up by an object they reference, such as the Path they follow.
+        :param name: The name of the attribute on the behaviors. Behaviors without it are left out.
+        :return: A list of (object, rows) tuples, where rows are the positions in the group of the behaviors that
+            reference that object.
+        """
+        groups = []
+        members = {}
+        for i, behavior in enumerate(self.behaviors):
+            value = getattr(behavior, name, None)
+            if value is not None:
+                if id(value) not in members:
+                    members[id(value)] = []
+                    groups.append((value, members[id(value)]))
+                members[id(value)].append(i)
+        return [(value, np.asarray(rows, dtype=np.intp)) for value, rows in groups]
+
+    def parameter(self, name, if_none=None):
+        """
+        Gathers an attribute of every behavior in the group into an array. The array is built once and then reused.
+        :param name: The name of the attribute on the behaviors.
+        :param if_none: What None is stored as in the array, for attributes that are optional.
+        """
+        if name not in self._parameters:
+            values = [getattr(behavior, name) for behavior in self.behaviors]
+            self._parameters[name] = np.array(
+                [if_none if value is None else value for value in values], dtype=np.float64
+            )
+        return self._parameters[name]
+
+    def state(self, name, if_none=-1, dtype=np.float64):
+        """
+        Gathers an attribute that the kernel updates every tick into an array, like the current_line of a FollowPath.
+        The array is built once and is written back to the behaviors by write_back.
+        :param name: The name of the attribute on the behaviors.
+        :param if_none: What None is stored as in the array.
+        :param dtype: The dtype of the array.
+        """
+        if name not in self._state:
+            values = [getattr(behavior, name) for behavior in self.behaviors]
+            self._state[name] = (
+                np.array([if_none if value is None else value for value in values], dtype=dtype), if_none
+            )
+        return self._state[name][0]
+
+    def write_back(self):
+        """
+        Copies the state the kernel updated back onto the behaviors.
+        """
+        for name, (values, if_none) in self._state.items():
+            for behavior, value in zip(self.behaviors, values.tolist()):
+                setattr(behavior, name, None if value == if_none else value)
+
+    def target_positions(self, batch):
+        """
+        Returns an (n, 2) array with the current position of each behavior's target.
+        :param batch: The MoverBatch the group belongs to.
+        """
+        positions = batch.position[self.target_indices]
+        for i in self.external_targets:
+            target = self.behaviors[i].target
+            positions[i] = target.position.as_tuple() if target is not None else (0, 0)
+        return positions
+
+
+def normalize_rows(vectors):
+    """
+    Returns each row of vectors divided by its length along with the lengths. Rows with a length of 0 stay 0.
+    """
+    lengths = np.sqrt((vectors * vectors).sum(axis=1))
+    safe = np.where(lengths == 0, 1, lengths)
+    return vectors / safe[:, None], lengths
+
+
+def store_steering(batch, indices, linear, untouched=False):
+    """
+    Stores the steering of Movers whose behavior, like every vectorized one, has no angular acceleration.
+    :param indices: The rows of the Movers.
+    :param linear: The linear acceleration of each Mover.
+    :param untouched: Which of the Movers got the default Vector(0, 0) of a SteeringOutput, which is still ints.
+    """
+    batch.linear_acceleration[indices] = linear
+    batch.angular_acceleration[indices] = 0
+    batch.integral["linear_acceleration"][indices] = np.reshape(untouched, (-1, 1))
+    batch.integral["angular_acceleration"][indices] = True
+
+
+def steer_continue(batch, group, delta):
+    # Movers that continue keep whatever accelerations they already had, so there is nothing to do.
+    pass
+
+
+def steer_seek(batch, group, delta):
+    direction, _ = normalize_rows(group.target_positions(batch) - batch.position[group.indices])
+
+    store_steering(batch, group.indices, direction * group.parameter("max_acceleration")[:, None])
+
+
+def steer_flee(batch, group, delta):
+    # The same as Seek with the difference reversed
+    direction, _ = normalize_rows(batch.position[group.indices] - group.target_positions(batch))
+
+    store_steering(batch, group.indices, direction * group.parameter("max_acceleration")[:, None])
+
+
+def steer_arrive(batch, group, delta):
+    max_speed = group.parameter("max_speed")
+    slow_radius = group.parameter("slow_radius")
+    max_acceleration = group.parameter("max_acceleration")
+
+    direction, distance = normalize_rows(group.target_positions(batch) - batch.position[group.indices])
+
+    # Movers outside the slow radius try to reach max_speed, the rest slow down as they get closer
+    target_speed = np.where(distance <= slow_radius, max_speed * distance / slow_radius, max_speed)
+    target_velocity = direction * target_speed[:, None]
+
+    linear = target_velocity - batch.velocity[group.indices]
+    linear /= group.parameter("time_to_target")[:, None]
+
+    # Clipping
+    clipped, magnitude = normalize_rows(linear)
+    too_fast = magnitude > max_acceleration
+    linear[too_fast] = clipped[too_fast] * max_acceleration[too_fast, None]
+
+    # Movers that have arrived stop accelerating
+    arrived = distance < group.parameter("target_radius")
+    linear[arrived] = 0
+
+    store_steering(batch, group.indices, linear, arrived)
+
+
+def steer_follow_path(batch, group, delta):
+    # The current_line and current_param of each FollowPath are kept in the group until they are written back, the
+    # target isn't updated
+    path_offset = group.parameter("path_offset")
+    max_acceleration = group.parameter("max_acceleration")
+    tracking_window = group.parameter("tracking_window", if_none=-1)
+    tracking_threshold = group.parameter("tracking_threshold")
+    current_line = group.state("current_line", dtype=np.intp)
+    current_param = group.state("current_param")
+
+    for path, rows in group.paths:
+        indices = group.indices[rows]
+
+        # Finding where each Mover is on the path, only searching around last tick's line for the ones that track it
+        tracked = tracking_window[rows] >= 0
+        line_indices, _, closest_points = path.track_closest_lines(
+            batch.position[indices], np.where(tracked, current_line[rows], -1), tracking_window[rows],
+            tracking_threshold[rows]
+        )
+        current_line[rows[tracked]] = line_indices[tracked]
+
+        # Seeking a little further along the path
+        current_param[rows] = path.get_line_params(line_indices, closest_points) + path_offset[rows]
+        targets = path.get_positions(current_param[rows])
+
+        direction, _ = normalize_rows(targets - batch.position[indices])
+        store_steering(batch, indices, direction * max_acceleration[rows, None])
+
+
+def steer_follow_flow_field(batch, group, delta):
+    max_acceleration = group.parameter("max_acceleration")
+
+    for flow_field, rows in group.flow_fields:
+        indices = group.indices[rows]
+
+        # Seeking the center of the next cell towards the goal
+        targets = flow_field.get_targets(batch.position[indices])
+
+        direction, _ = normalize_rows(targets - batch.position[indices])
+        store_steering(batch, indices, direction * max_acceleration[rows, None])
+
+
+# Maps a behavior id to the behavior class it belongs to and the function that steers a SteeringGroup of it
+STEERING_KERNELS = {
+    1: (Continue, steer_continue),
+    6: (Seek, steer_seek),
+    7: (Flee, steer_flee),
+    8: (Arrive, steer_arrive),
+    11: (FollowPath, steer_follow_path),
+    12: (FollowFlowField, steer_follow_flow_field),
+}
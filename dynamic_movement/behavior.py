@@ -1,6 +1,5 @@
 from dynamic_movement import Vector, Mover, Target, Path
-from output import OutputManager
-import abc
+import abc, math
 
 class SteeringOutput:
     """
@@ -145,7 +144,16 @@ class Arrive(DynamicBehavior):
         return result
 
 class FollowPath(Seek):
-    def __init__(self, character, path, path_offset=0.1):
+    def __init__(self, character, path, path_offset=0.1, tracking_window=None, tracking_threshold=math.inf):
+        """
+
+        :param character: The Mover that is being controlled.
+        :param path: The Path to follow.
+        :param path_offset: How far ahead on the path (as a param) to seek.
+        :param tracking_window: If set, only this many lines on either side of last tick's closest line are searched.
+        :param tracking_threshold: How far from the windowed result the character can be before the whole path is
+            searched again.
+        """
         super().__init__(character, Target())
         self.id = 11
 
@@ -153,25 +161,38 @@ class FollowPath(Seek):
         self.path_offset = path_offset
         self.current_param = 0
 
+        self.tracking_window = tracking_window
+        self.tracking_threshold = tracking_threshold
+        self.current_line = None
+
         self.time = 0
-        self.output_manager: OutputManager = OutputManager.get_output_manager()
 
     def execute(self, delta) -> SteeringOutput:
 
         # Updating param based on current position
-        self.current_param, closest_point_on_path = self.path.get_param(self.character.position)
+        if self.tracking_window is None:
+            self.current_param, closest_point_on_path = self.path.get_param(self.character.position)
+        else:
+            self.current_line, _, closest_point_on_path = self.path.track_closest_line(
+                self.character.position, self.current_line, self.tracking_window, self.tracking_threshold
+            )
+            self.current_param = self.path.get_line_param(self.current_line, closest_point_on_path)
         # I added closest_point_on_path so that I could draw it in my gifs
 
         # Closest point on path
         # closest_point_on_path = self.path.get_position(self.current_param)
-        # self.output_manager.write_temporary_point(self.time, closest_point_on_path.x, closest_point_on_path.y)
+        # OutputManager.get_output_manager().write_temporary_point(
+        #     self.time, closest_point_on_path.x, closest_point_on_path.y
+        # )
 
         # Making us a little further along the path
         self.current_param += self.path_offset
 
         # Finding the target point
         self.target.position = self.path.get_position(self.current_param)
-        # self.output_manager.write_temporary_point(self.time, self.target.position.x, self.target.position.y)
+        # OutputManager.get_output_manager().write_temporary_point(
+        #     self.time, self.target.position.x, self.target.position.y
+        # )
 
         # Distance between closest point and target point
         distance_to = (closest_point_on_path - self.target.position).magnitude()
@@ -181,3 +202,76 @@ class FollowPath(Seek):
         # print(f"Distance To Target: {distance_to}")
         self.time += delta
         return super().execute(delta)
+
+
+class FollowFlowField(Seek):
+    def __init__(self, character, flow_field):
+        """
+
+        :param character: The Mover that is being controlled.
+        :param flow_field: The FlowField leading to the goal.
+        """
+        super().__init__(character, Target())
+        self.id = 12
+
+        self.flow_field = flow_field
+
+    def execute(self, delta) -> SteeringOutput:
+        # Seeking the center of the next cell towards the goal
+        self.target.position = self.flow_field.get_target(self.character.position)
+        return super().execute(delta)
+
+class ObstacleAvoidance(Seek):
+    def __init__(self, character, walls, behavior, avoid_distance=5, lookahead=3, whisker_lookahead=2,
+                 whisker_angle=math.pi / 6):
+        """
+        Casts a ray ahead of the character and two shorter whiskers to either side of it. If any of them hit a wall,
+        the character seeks a point away from the wall, otherwise it does what the other behavior says.
+
+        :param character: The Mover that is being controlled.
+        :param walls: A SegmentGrid of the walls, such as the one from WallSegments.get_segment_grid.
+        :param behavior: The behavior to use when there is no wall in the way.
+        :param avoid_distance: How far out from a wall that is about to be hit to seek.
+        :param lookahead: The length of the ray straight ahead.
+        :param whisker_lookahead: The length of the whiskers.
+        :param whisker_angle: The angle between each whisker and the ray straight ahead, in radians.
+        """
+        super().__init__(character, Target())
+        self.id = 13
+
+        self.walls = walls
+        self.behavior: DynamicBehavior = behavior
+        self.avoid_distance = avoid_distance
+        self.rays = [
+            (1, 0, lookahead),
+            (math.cos(whisker_angle), math.sin(whisker_angle), whisker_lookahead),
+            (math.cos(whisker_angle), -math.sin(whisker_angle), whisker_lookahead)
+        ]
+
+    def execute(self, delta) -> SteeringOutput:
+        position, velocity = self.character.position, self.character.velocity
+        speed = velocity.magnitude()
+        if speed == 0:
+            return self.behavior.execute(delta)
+
+        # Casting every ray, rotated to face along the velocity
+        forward_x, forward_y = velocity.x / speed, velocity.y / speed
+        closest = None
+        for cos, sin, length in self.rays:
+            dx, dy = forward_x * cos - forward_y * sin, forward_x * sin + forward_y * cos
+            hit = self.walls.raycast(position.x, position.y, dx, dy, length)
+            if hit is not None and (closest is None or hit[1] < closest[1]):
+                closest = hit[0], hit[1], dx, dy
+
+        if closest is None:
+            return self.behavior.execute(delta)
+
+        # The normal of the wall, on the side the ray came from
+        index, t, dx, dy = closest
+        p1, p2 = self.walls.segments[index]
+        normal = Vector(p1.y - p2.y, p2.x - p1.x).normalize()
+        if normal.x * dx + normal.y * dy > 0:
+            normal = normal * -1
+
+        self.target.position = Vector(position.x + t * dx, position.y + t * dy) + normal * self.avoid_distance
+        return super().execute(delta)
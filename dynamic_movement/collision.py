@@ -0,0 +1,256 @@
+"""
+Collision detection between Movers.
+
+Every Mover is treated as a circle with its radius. Finding which circles overlap is split into a broad phase, which
+buckets the Movers into a grid so that only Movers in neighboring cells are ever compared, and a narrow phase, which
+checks the actual distance between those. The broad phases can also be used on their own to find the Movers near a
+point, such as for separation or flocking behaviors.
+
+SpatialHash works on plain positions, while GridIndex works on the arrays of a MoverBatch and requires NumPy.
+"""
+import math
+
+# The cells that are compared with each cell. Only half of the neighboring cells are needed, since the other half
+# compare themselves with this one.
+HALF_NEIGHBORHOOD = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class SpatialHash:
+    """
+    A grid of cells that each hold the indices of the positions inside them. Only the cells that have something in
+    them are stored, so the grid can cover any area.
+    """
+    def __init__(self, cell_size):
+        """
+        :param cell_size: The width of each cell. For get_pairs this must be at least the largest distance that counts.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.keys = []
+        self.positions = []
+
+    def get_key(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def update(self, positions):
+        """
+        Moves every position to its current cell. Only the positions that changed cells are touched, unless the amount
+        of positions changed, in which case everything is put back in from scratch.
+        :param positions: The (x, y) of everything in the grid, which index i of the cells refers to.
+        """
+        positions = [(position[0], position[1]) for position in positions]
+        if len(positions) != len(self.keys):
+            self.cells = {}
+            self.keys = [None] * len(positions)
+
+        cells, keys = self.cells, self.keys
+        for index, (x, y) in enumerate(positions):
+            key = self.get_key(x, y)
+            if key != keys[index]:
+                if keys[index] is not None:
+                    cell = cells[keys[index]]
+                    cell.discard(index)
+                    if not cell:
+                        del cells[keys[index]]
+                cells.setdefault(key, set()).add(index)
+                keys[index] = key
+
+        self.positions = positions
+
+    def query(self, x, y, radius):
+        """
+        Finds everything within a radius of a point.
+        :return: The indices of the positions that are within the radius, in no particular order.
+        """
+        cells, positions = self.cells, self.positions
+        x1, y1 = self.get_key(x - radius, y - radius)
+        x2, y2 = self.get_key(x + radius, y + radius)
+
+        found = []
+        radius_squared = radius * radius
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                for index in cells.get((cx, cy), ()):
+                    px, py = positions[index]
+                    if (px - x) ** 2 + (py - y) ** 2 <= radius_squared:
+                        found.append(index)
+        return found
+
+    def get_pairs(self, radii):
+        """
+        Finds every pair of circles that overlap.
+        :param radii: The radius of the circle at each position. Twice the largest one can't be more than the cell size.
+        :return: A list of (i, j) pairs with i < j.
+        """
+        cells, positions = self.cells, self.positions
+        pairs = []
+        for (cx, cy), cell in cells.items():
+            for ox, oy in HALF_NEIGHBORHOOD:
+                other = cell if (ox, oy) == (0, 0) else cells.get((cx + ox, cy + oy))
+                if not other:
+                    continue
+
+                for i in cell:
+                    x, y = positions[i]
+                    for j in other:
+                        if other is cell and j <= i:
+                            continue
+                        distance = radii[i] + radii[j]
+                        px, py = positions[j]
+                        if (px - x) ** 2 + (py - y) ** 2 < distance * distance:
+                            pairs.append((i, j) if i < j else (j, i))
+        return pairs
+
+
+class GridIndex:
+    """
+    The NumPy version of SpatialHash. The positions are sorted by cell every time it is rebuilt, so each cell is a
+    contiguous range of the sorted order and every lookup is a vectorized binary search.
+    """
+    def __init__(self, cell_size):
+        """
+        :param cell_size: The width of each cell. For get_pairs this must be at least the largest distance that counts.
+        """
+        self.cell_size = cell_size
+        self.positions = None
+        self.order = None
+        self.sorted_keys = None
+        self.cell_x = self.cell_y = None
+
+    @staticmethod
+    def get_keys(cell_x, cell_y):
+        # Packing both cell coordinates into one integer that sorts by x and then by y
+        return (cell_x << 32) + cell_y
+
+    def rebuild(self, positions):
+        """
+        :param positions: An (n, 2) array of the positions to put in the grid.
+        """
+        import numpy as np
+
+        self.positions = positions
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        self.cell_x, self.cell_y = cells[:, 0], cells[:, 1]
+
+        keys = GridIndex.get_keys(self.cell_x, self.cell_y)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def query(self, x, y, radius):
+        """
+        Finds everything within a radius of a point.
+        :return: An array of the indices of the positions that are within the radius.
+        """
+        import numpy as np
+
+        x1, y1 = math.floor((x - radius) / self.cell_size), math.floor((y - radius) / self.cell_size)
+        x2, y2 = math.floor((x + radius) / self.cell_size), math.floor((y + radius) / self.cell_size)
+
+        # Each column of cells is one range of the sorted order
+        found = []
+        for cx in range(x1, x2 + 1):
+            start = np.searchsorted(self.sorted_keys, GridIndex.get_keys(cx, y1), "left")
+            end = np.searchsorted(self.sorted_keys, GridIndex.get_keys(cx, y2), "right")
+            found.append(self.order[start:end])
+        found = np.concatenate(found)
+
+        offsets = self.positions[found] - (x, y)
+        return found[(offsets * offsets).sum(axis=1) <= radius * radius]
+
+    def get_candidates(self):
+        """
+        The broad phase. Finds every pair of positions in the same or neighboring cells.
+        :return: Two arrays (i, j) of the indices of each pair, each pair appearing once.
+        """
+        import numpy as np
+
+        sorted_keys = self.sorted_keys
+        everything = np.arange(len(sorted_keys))
+        candidates_i, candidates_j = [], []
+        for ox, oy in HALF_NEIGHBORHOOD:
+            # Moving over to a neighboring cell adds the same amount to every key, so searching for the neighbors of
+            # the positions in sorted order is a search for sorted keys, which is far friendlier to the cache
+            keys = sorted_keys + GridIndex.get_keys(ox, oy)
+            starts = np.searchsorted(sorted_keys, keys, "left")
+            counts = np.searchsorted(sorted_keys, keys, "right") - starts
+
+            # Expanding every (position, range of the sorted order) into a pair per position in the range
+            first = np.cumsum(counts) - counts
+            i = np.repeat(everything, counts)
+            j = np.repeat(starts - first, counts) + np.arange(counts.sum())
+
+            if (ox, oy) == (0, 0):
+                # Positions in the same cell would otherwise be paired with themselves and paired twice
+                keep = i < j
+                i, j = i[keep], j[keep]
+            candidates_i.append(self.order[i])
+            candidates_j.append(self.order[j])
+
+        return np.concatenate(candidates_i), np.concatenate(candidates_j)
+
+    def get_pairs(self, radii):
+        """
+        Finds every pair of circles that overlap.
+        :param radii: An array of the radius of the circle at each position. Twice the largest one can't be more than
+            the cell size.
+        :return: Two arrays (i, j) of the indices of each pair that overlaps.
+        """
+        i, j = self.get_candidates()
+
+        # The narrow phase
+        offsets = self.positions[i] - self.positions[j]
+        distances = radii[i] + radii[j]
+        overlapping = (offsets * offsets).sum(axis=1) < distances * distances
+        return i[overlapping], j[overlapping]
+
+
+class CollisionSystem:
+    """
+    Sets the collision_state of every Mover to whether its circle overlaps another Mover's.
+    """
+    def __init__(self, cell_size=None):
+        """
+        :param cell_size: The width of the cells of the broad phase. Defaults to twice the largest radius.
+        """
+        self.cell_size = cell_size
+        self.index = None
+
+    def get_cell_size(self, largest_radius):
+        if self.cell_size is not None:
+            return self.cell_size
+        return max(2 * largest_radius, 1e-9)
+
+    def update(self, movers, batch=None):
+        """
+        Detects the collisions between the Movers at their current positions.
+        :param movers: The Movers to check.
+        :param batch: The MoverBatch the Movers are bound to, if any. Its arrays are used directly.
+        :return: The pairs of Movers that collided, as indices into movers.
+        """
+        if batch is not None:
+            cell_size = self.get_cell_size(batch.radius.max(initial=0))
+            if not isinstance(self.index, GridIndex) or self.index.cell_size != cell_size:
+                self.index = GridIndex(cell_size)
+
+            self.index.rebuild(batch.position)
+            i, j = self.index.get_pairs(batch.radius)
+            batch.collision_state[:] = False
+            batch.collision_state[i] = True
+            batch.collision_state[j] = True
+            return list(zip(i.tolist(), j.tolist()))
+
+        radii = [mover.radius for mover in movers]
+        cell_size = self.get_cell_size(max(radii, default=0))
+        if not isinstance(self.index, SpatialHash) or self.index.cell_size != cell_size:
+            self.index = SpatialHash(cell_size)
+
+        self.index.update([mover.position.as_tuple() for mover in movers])
+        pairs = self.index.get_pairs(radii)
+
+        colliding = set()
+        for i, j in pairs:
+            colliding.add(i)
+            colliding.add(j)
+        for index, mover in enumerate(movers):
+            mover.collision_state = index in colliding
+        return pairs
@@ -1,4 +1,8 @@
 from dynamic_movement import *
+from dynamic_movement.vector import Vector2
+from array import array
+from bisect import bisect_left
+import math
 
 
 def closest_point(point1: Vector, point2: Vector, position: Vector):
@@ -16,7 +20,334 @@ def closest_point(point1: Vector, point2: Vector, position: Vector):
     return point1 + line * percentage_along_line
 
 
+def point_segment_distance(point, point1, point2):
+    """
+    Returns the distance between a point and the line segment from point1 to point2. The points are (x, y) tuples.
+    """
+    (x, y), (x1, y1), (x2, y2) = point, point1, point2
+    dx, dy = x2 - x1, y2 - y1
+    length_squared = dx * dx + dy * dy
+
+    percentage = 0
+    if length_squared != 0:
+        percentage = max(min(((x - x1) * dx + (y - y1) * dy) / length_squared, 1), 0)
+    return math.hypot(x - x1 - dx * percentage, y - y1 - dy * percentage)
+
+
+def simplify_path(points, tolerance=0, is_clear=None):
+    """
+    Removes the points of a path that barely change its shape, so that it can be turned into a Path with fewer lines.
+
+    Points in the middle of a straight run are always removed. If a tolerance is given, the Ramer-Douglas-Peucker
+    algorithm then replaces every stretch of the path that strays less than the tolerance from a straight line with
+    that line.
+    :param points: The (x, y) tuples of the path, such as the cell centers along a path through a maze.
+    :param tolerance: How far the removed points can be from the simplified path.
+    :param is_clear: A function that takes two points and returns whether a straight line between them is allowed,
+        such as Maze.is_clear. Stretches are only replaced with lines it allows.
+    :return: The points that are kept, in order.
+    """
+    # Merging straight runs, along with any repeated points
+    merged = []
+    for point in points:
+        if merged and point == merged[-1]:
+            continue
+        if len(merged) >= 2:
+            (x1, y1), (x2, y2) = merged[-2], merged[-1]
+            cross = (x2 - x1) * (point[1] - y2) - (y2 - y1) * (point[0] - x2)
+            dot = (x2 - x1) * (point[0] - x2) + (y2 - y1) * (point[1] - y2)
+            if cross == 0 and dot > 0:
+                merged[-1] = point
+                continue
+        merged.append(point)
+
+    if tolerance <= 0 or len(merged) < 3:
+        return merged
+
+    keep = [False] * len(merged)
+    keep[0] = keep[-1] = True
+    todo = [(0, len(merged) - 1)]
+    while todo:
+        first, last = todo.pop()
+        if last - first < 2:
+            continue
+
+        # The point in between that is the farthest from a straight line between the ends of the stretch
+        farthest, farthest_distance = first, -1
+        for i in range(first + 1, last):
+            distance = point_segment_distance(merged[i], merged[first], merged[last])
+            if distance > farthest_distance:
+                farthest, farthest_distance = i, distance
+
+        if farthest_distance <= tolerance and (is_clear is None or is_clear(merged[first], merged[last])):
+            continue
+
+        keep[farthest] = True
+        todo.append((first, farthest))
+        todo.append((farthest, last))
+
+    return [point for point, kept in zip(merged, keep) if kept]
+
+
+def merge_runs(ends):
+    """
+    Merges ranges that touch or overlap.
+    :param ends: The start and end of every range, one after the other.
+    :return: The start and end of every merged range, one after the other, in order.
+    """
+    order = sorted(range(0, len(ends), 2), key=ends.__getitem__)
+    merged = []
+    for i in order:
+        start, end = ends[i], ends[i + 1]
+        if merged and start <= merged[-1]:
+            merged[-1] = max(merged[-1], end)
+        else:
+            merged += (start, end)
+    return merged
+
+
+class WallSegments:
+    """
+    Horizontal and vertical walls, stored as a flat array of the x1, y1, x2, y2 coordinates of each one.
+    """
+    def __init__(self, coordinates=()):
+        """
+        :param coordinates: The integer coordinates of the walls, four per wall.
+        """
+        self.coordinates = array("q", coordinates)
+        self.segment_grid = None
+
+    @classmethod
+    def merge(cls, segments):
+        """
+        Merges walls that touch end to end on the same line into a single wall.
+        :param segments: ((x1, y1), (x2, y2)) walls, which all have to be either horizontal or vertical.
+        :return: The merged walls, the vertical ones first, each group in order of its coordinates.
+        """
+        # The ends of the walls along each line are kept as flat lists of numbers, which are much cheaper to hold on to
+        # than a tuple per wall
+        vertical, horizontal = {}, {}
+        for (x1, y1), (x2, y2) in segments:
+            if x1 == x2:
+                vertical.setdefault(x1, []).extend((min(y1, y2), max(y1, y2)))
+            elif y1 == y2:
+                horizontal.setdefault(y1, []).extend((min(x1, x2), max(x1, x2)))
+            else:
+                raise ValueError("Only horizontal and vertical walls can be merged!")
+
+        walls = cls()
+        for x in sorted(vertical):
+            ends = merge_runs(vertical[x])
+            for i in range(0, len(ends), 2):
+                walls.add(x, ends[i], x, ends[i + 1])
+        for y in sorted(horizontal):
+            ends = merge_runs(horizontal[y])
+            for i in range(0, len(ends), 2):
+                walls.add(ends[i], y, ends[i + 1], y)
+        return walls
+
+    def __len__(self):
+        return len(self.coordinates) // 4
+
+    def __iter__(self):
+        coordinates = self.coordinates
+        for i in range(0, len(coordinates), 4):
+            yield (coordinates[i], coordinates[i + 1]), (coordinates[i + 2], coordinates[i + 3])
+
+    def add(self, x1, y1, x2, y2):
+        self.coordinates.extend((x1, y1, x2, y2))
+        self.segment_grid = None
+
+    def get_segment_grid(self):
+        """
+        Returns a SegmentGrid of the walls for raycasting against them, building it once.
+        """
+        if self.segment_grid is None:
+            self.segment_grid = SegmentGrid([(Vector2(*p1), Vector2(*p2)) for p1, p2 in self])
+        return self.segment_grid
+
+    def format_lines(self):
+        """
+        Yields each wall as a line of paths.txt, without building them all at once.
+        """
+        for (x1, y1), (x2, y2) in self:
+            yield f"line, {x1}, {y1}, {x2}, {y2}\n"
+
+
+class SegmentGrid:
+    """
+    A uniform grid that buckets line segments by the cells they overlap, so that only the segments near a point have
+    to be checked when looking for the closest one.
+    """
+    def __init__(self, segments, cell_size=None):
+        """
+        :param segments: A list of (point1, point2) pairs. The points only need to have an x and a y.
+        :param cell_size: The width of each cell. Defaults to the average length of the segments.
+        """
+        xs = [point.x for segment in segments for point in segment]
+        ys = [point.y for segment in segments for point in segment]
+        self.min_x, self.min_y = min(xs), min(ys)
+        width, height = max(xs) - self.min_x, max(ys) - self.min_y
+
+        if cell_size is None:
+            lengths = [math.hypot(p2.x - p1.x, p2.y - p1.y) for p1, p2 in segments]
+            cell_size = sum(lengths) / len(lengths)
+            # Keeping the amount of cells proportional to the amount of segments
+            cell_size = max(cell_size, math.sqrt(width * height / (4 * len(segments))), 1e-9)
+        self.cell_size = cell_size
+        self.segments = segments
+
+        self.columns = int(width / cell_size) + 1
+        self.rows = int(height / cell_size) + 1
+
+        # Every segment is put in every cell its bounding box overlaps. The boxes are padded a tiny bit so that
+        # rounding can never leave a segment out of a cell it touches.
+        padding = cell_size * 1e-6
+        self.cells = {}
+        for index, (p1, p2) in enumerate(segments):
+            x1, y1 = self.get_cell(min(p1.x, p2.x) - padding, min(p1.y, p2.y) - padding)
+            x2, y2 = self.get_cell(max(p1.x, p2.x) + padding, max(p1.y, p2.y) + padding)
+            for cx in range(max(x1, 0), min(x2, self.columns - 1) + 1):
+                for cy in range(max(y1, 0), min(y2, self.rows - 1) + 1):
+                    self.cells.setdefault((cx, cy), []).append(index)
+
+    def get_cell(self, x, y):
+        return math.floor((x - self.min_x) / self.cell_size), math.floor((y - self.min_y) / self.cell_size)
+
+    def raycast(self, x, y, dx, dy, max_distance=math.inf):
+        """
+        Finds the first segment a ray hits. The cells along the ray are walked in order, so only the segments in those
+        cells are checked, and the walk stops at the first cell that has a hit before its far side.
+        :param x: The x of the start of the ray.
+        :param y: The y of the start of the ray.
+        :param dx: The x of the direction of the ray.
+        :param dy: The y of the direction of the ray.
+        :param max_distance: How far along the ray to look, in multiples of (dx, dy).
+        :return: (segment_index, t) of the closest hit, which is at (x + t * dx, y + t * dy), or None if there is none.
+        """
+        cell_size, cells, segments = self.cell_size, self.cells, self.segments
+
+        # Clipping the ray to the area the grid covers
+        start, end = 0, max_distance
+        for origin, direction, low, high in (
+            (x, dx, self.min_x, self.min_x + self.columns * cell_size),
+            (y, dy, self.min_y, self.min_y + self.rows * cell_size)
+        ):
+            if direction:
+                t1, t2 = (low - origin) / direction, (high - origin) / direction
+                start, end = max(start, min(t1, t2)), min(end, max(t1, t2))
+            elif not low <= origin <= high:
+                return None
+        if start > end:
+            return None
+
+        cx, cy = self.get_cell(x + start * dx, y + start * dy)
+        cx, cy = min(max(cx, 0), self.columns - 1), min(max(cy, 0), self.rows - 1)
+
+        # How far along the ray the next column and row boundaries are, and how far apart they are
+        step_x, step_y = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        next_x = (self.min_x + (cx + (dx > 0)) * cell_size - x) / dx if dx else math.inf
+        next_y = (self.min_y + (cy + (dy > 0)) * cell_size - y) / dy if dy else math.inf
+        delta_x = cell_size / abs(dx) if dx else math.inf
+        delta_y = cell_size / abs(dy) if dy else math.inf
+
+        closest, closest_t = None, end
+        checked = set()
+        while True:
+            for index in cells.get((cx, cy), ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+
+                # Solving (x, y) + t * (dx, dy) = p1 + u * (p2 - p1) for t and u
+                p1, p2 = segments[index]
+                ex, ey = p2.x - p1.x, p2.y - p1.y
+                denominator = dx * ey - dy * ex
+                if denominator == 0:
+                    # Parallel to the ray
+                    continue
+                ax, ay = p1.x - x, p1.y - y
+                t = (ax * ey - ay * ex) / denominator
+                u = (ax * dy - ay * dx) / denominator
+                if 0 <= u <= 1 and 0 <= t <= closest_t:
+                    closest, closest_t = index, t
+
+            # Segments that weren't in this cell can only be hit further along the ray than its far side
+            cell_end = min(next_x, next_y)
+            if (closest is not None and closest_t <= cell_end) or cell_end >= end:
+                break
+
+            if next_x < next_y:
+                cx += step_x
+                next_x += delta_x
+            else:
+                cy += step_y
+                next_y += delta_y
+            if not (0 <= cx < self.columns and 0 <= cy < self.rows):
+                break
+
+        return None if closest is None else (closest, closest_t)
+
+    def search(self, x, y):
+        """
+        Yields the segments around a point in rings of cells of increasing size.
+
+        Each ring is yielded as (segment_indices, bound), where bound is a lower bound on the distance from the point
+        to any segment that hasn't been yielded yet. Segments can be yielded more than once.
+        :param x: The x of the point.
+        :param y: The y of the point.
+        """
+        cx, cy = self.get_cell(x, y)
+
+        # Rings closer than this don't overlap the grid at all
+        radius = max(0, -cx, cx - (self.columns - 1), -cy, cy - (self.rows - 1))
+        while True:
+            indices = []
+            for cell in self.ring(cx, cy, radius):
+                indices += self.cells.get(cell, ())
+
+            low_x, low_y = cx - radius, cy - radius
+            high_x, high_y = cx + radius, cy + radius
+            if low_x <= 0 and low_y <= 0 and high_x >= self.columns - 1 and high_y >= self.rows - 1:
+                # Every cell has been searched
+                yield indices, math.inf
+                return
+
+            # The distance from the point to the edge of the searched square of cells
+            bound = min(
+                x - (self.min_x + low_x * self.cell_size),
+                self.min_x + (high_x + 1) * self.cell_size - x,
+                y - (self.min_y + low_y * self.cell_size),
+                self.min_y + (high_y + 1) * self.cell_size - y
+            )
+            yield indices, bound
+            radius += 1
+
+    def ring(self, cx, cy, radius):
+        """
+        Yields the cells of the grid that are exactly radius cells away from (cx, cy).
+        """
+        if radius == 0:
+            yield cx, cy
+            return
+
+        x_range = range(max(cx - radius, 0), min(cx + radius, self.columns - 1) + 1)
+        for y in (cy - radius, cy + radius):
+            if 0 <= y < self.rows:
+                for x in x_range:
+                    yield x, y
+
+        y_range = range(max(cy - radius + 1, 0), min(cy + radius - 1, self.rows - 1) + 1)
+        for x in (cx - radius, cx + radius):
+            if 0 <= x < self.columns:
+                for y in y_range:
+                    yield x, y
+
+
 class Path:
+    # Paths with at least this many lines get a SegmentGrid to speed up finding the closest line
+    grid_threshold = 32
+
     def __init__(self, *points: [tuple]):
         self.points: [Vector] = [Vector(*point) for point in points]
 
@@ -24,13 +355,37 @@ class Path:
         self.path_length = sum(distances)
         self.relative_distances = [distance / self.path_length for distance in distances]
 
-    def get_param(self, position: Vector) -> float:
+        # Cached so that mapping between params and lines doesn't have to re-sum or re-measure anything.
+        # cumulative_distances[i] is the param at the start of line i, and the last entry is the end of the path.
+        self.cumulative_distances = [0]
+        for relative_distance in self.relative_distances:
+            self.cumulative_distances.append(self.cumulative_distances[-1] + relative_distance)
+        self.lengths = distances
+
+        # NumPy versions of the above, only built if the batched queries are used
+        self._arrays = None
+
+        self.segment_grid = None
+        if len(distances) >= Path.grid_threshold:
+            self.segment_grid = SegmentGrid([(self.points[i], self.points[i + 1]) for i in range(len(distances))])
+
+    def get_closest_line(self, position: Vector, lines=None):
+        """
+        Finds the line of the path that is closest to a position.
+
+        When several lines are equally close the one that comes first in the path wins.
+        :param position: The position to find the closest line to.
+        :param lines: The indices of the lines to check. Defaults to every line of the path.
+        :return: (line_index, smallest_distance, closest_point_on_path)
+        """
+        if lines is None and self.segment_grid is not None:
+            return self.search_closest_line(position)
 
         smallest_distance = 100_000_000  # Essentially Inf
         line_index = 0  # Eventually the index of the closest line
         closest_point_on_path = self.points[0]  # Eventually the exact closest point
         # Loops through every pair of points
-        for i in range(len(self.points) - 1):
+        for i in (range(len(self.points) - 1) if lines is None else lines):
             # The pair of points the line consists of
             point1, point2 = self.points[i], self.points[i + 1]
 
@@ -47,23 +402,85 @@ class Path:
                 line_index = i
                 closest_point_on_path = point_on_line
 
+        return line_index, smallest_distance, closest_point_on_path
+
+    def search_closest_line(self, position: Vector):
+        """
+        Does the same thing as get_closest_line, but only checks the lines in the cells of the SegmentGrid around
+        the position, stopping once no unchecked line could be closer.
+        """
+        smallest_distance = 100_000_000  # Essentially Inf
+        line_index = 0
+        closest_point_on_path = self.points[0]
+        checked = set()
+        for lines, bound in self.segment_grid.search(position.x, position.y):
+            for i in lines:
+                if i in checked:
+                    continue
+                checked.add(i)
+
+                point_on_line = closest_point(self.points[i], self.points[i + 1], position)
+                distance = (point_on_line - position).magnitude()
+
+                # Lines aren't checked in order, so ties go to the earlier line to match checking every line
+                if distance < smallest_distance or (distance == smallest_distance and i < line_index):
+                    smallest_distance = distance
+                    line_index = i
+                    closest_point_on_path = point_on_line
+
+            if smallest_distance < bound:
+                break
+
+        return line_index, smallest_distance, closest_point_on_path
+
+    def track_closest_line(self, position: Vector, last_line: int, window: int = 2, threshold: float = math.inf):
+        """
+        Finds the closest line to a position by only checking the lines around the last known closest line.
+
+        Movers only move a little bit every tick, so the closest line is almost always the same one or a neighbor.
+        If nothing in the window is within the threshold, the whole path is searched instead.
+        :param position: The position to find the closest line to.
+        :param last_line: The index of the closest line last tick, or None to search the whole path.
+        :param window: How many lines to check on either side of last_line.
+        :param threshold: The distance past which the window's result is thrown away.
+        :return: (line_index, smallest_distance, closest_point_on_path)
+        """
+        if last_line is None:
+            return self.get_closest_line(position)
+
+        lines = range(max(last_line - window, 0), min(last_line + window + 1, len(self.points) - 1))
+        result = self.get_closest_line(position, lines)
+        if result[1] > threshold:
+            return self.get_closest_line(position)
+
+        return result
+
+    def get_param(self, position: Vector) -> float:
+
+        line_index, _, closest_point_on_path = self.get_closest_line(position)
+
         # print(f"[{closest_point_on_path.x: 5.2f}, {closest_point_on_path.y:5.2f}],")
         # print(f"Closest Line: {line_index:3}")
 
-        # Calculating the percentage of the path that is before the closest line
-        param = 0
-        for i in range(line_index):
-            param += self.relative_distances[i]
+        # Returning both the param and closest point for debugging purposes
+        return self.get_line_param(line_index, closest_point_on_path), closest_point_on_path
 
-        # Finding the points of the closest line
-        point1 = self.points[line_index]
-        point2 = self.points[line_index + 1]
+    def get_line_param(self, line_index: int, closest_point_on_path: Vector) -> float:
+        """
+        Converts a point on one of the path's lines to the param of that point.
+        :param line_index: The index of the line the point is on.
+        :param closest_point_on_path: The point on the line.
+        """
+        # The percentage of the path that is before the closest line
+        param = self.cumulative_distances[line_index]
 
-        # Adding the distance along the closest line
-        param += (closest_point_on_path - point1).magnitude() / (point2 - point1).magnitude() * self.relative_distances[line_index]
+        # Adding the distance along the closest line. This divides by the length of the line just like the original
+        # loop did, so the param comes out exactly the same.
+        distance_along_line = (closest_point_on_path - self.points[line_index]).magnitude()
+        if distance_along_line:
+            param += distance_along_line / self.lengths[line_index] * self.relative_distances[line_index]
 
-        # Returning both the param and closest point for debugging purposes
-        return param, closest_point_on_path
+        return param
 
     def get_position(self, param: float) -> Vector:
 
@@ -71,15 +488,15 @@ class Path:
         param = min(1.0, max(0.0, param))
         # print(f"Param: {param:04.2f}")
 
-        i = 0   # Finding the index of the closest line based on the parameter
-        while param > self.relative_distances[i] and i < len(self.relative_distances) - 1:
-            param -= self.relative_distances[i]  # We subtract so we can calculate percentage
-            i += 1
+        # Finding the index of the first line that ends at or after the parameter
+        i = bisect_left(self.cumulative_distances, param, 1, len(self.cumulative_distances) - 1) - 1
 
         # print(f"Lerp Line: {i:3}")
 
-        # Percentage along line i
-        percentage = param / self.relative_distances[i]
+        # Percentage along line i. Subtracting the whole start of the line at once instead of one line at a time
+        # rounds differently, so this can be off from the original loop in the last bits.
+        relative_distance = self.relative_distances[i]
+        percentage = (param - self.cumulative_distances[i]) / relative_distance if relative_distance else 0.0
 
         # Clipping percentage to range [0, 1]
         percentage = min(1.0, max(0.0, percentage))
@@ -94,6 +511,188 @@ class Path:
         # print(f"Target Position: {ret}")
         return ret
 
+    def get_arrays(self):
+        """
+        Returns the path's points and cached line data as NumPy arrays for the batched queries, building them once.
+        """
+        if self._arrays is None:
+            # Importing here so that NumPy is only required for batched queries
+            import numpy as np
+
+            starts = np.array([point.as_tuple() for point in self.points[:-1]], dtype=np.float64)
+            ends = np.array([point.as_tuple() for point in self.points[1:]], dtype=np.float64)
+            lines = ends - starts
+            self._arrays = {
+                "starts": starts,
+                "ends": ends,
+                "lines": lines,
+                "line_dots": (lines * lines).sum(axis=1),
+                "cumulative_distances": np.array(self.cumulative_distances, dtype=np.float64),
+                "relative_distances": np.array(self.relative_distances, dtype=np.float64),
+                "lengths": np.array(self.lengths, dtype=np.float64),
+            }
+        return self._arrays
+
+    @staticmethod
+    def project(positions, starts, lines, line_dots):
+        """
+        Projects positions onto lines, the batched version of closest_point.
+
+        :param positions: An (n, 2) array of positions.
+        :param starts: The starts of the lines, as an (n, k, 2) array of k lines per position or a (1, k, 2) array of
+            the same k lines for every position. lines and line_dots are shaped the same way.
+        :param lines: The vectors from the start to the end of each line.
+        :param line_dots: The squared length of each line, without the last axis.
+        :return: (points_on_lines, distances) as an (n, k, 2) array and an (n, k) array. The distances are square roots,
+            which can be off from the ** (1/2) of Vector.magnitude in the last bit.
+        """
+        import numpy as np
+
+        # (X-P).dot(Q-P) / (Q-P).dot(Q-P) for every position and line, clipped to the range [0, 1]
+        relative = positions[:, None, :] - starts
+        percentage = (relative * lines).sum(axis=2) / line_dots
+        np.clip(percentage, 0, 1, out=percentage)
+
+        points_on_lines = starts + lines * percentage[:, :, None]
+        offsets = points_on_lines - positions[:, None, :]
+        return points_on_lines, np.sqrt((offsets * offsets).sum(axis=2))
+
+    def get_closest_lines(self, positions, chunk_size=1 << 20):
+        """
+        The batched version of get_closest_line. Every position is projected onto every line at once, which takes time
+        proportional to the amount of positions times the amount of lines, so on long paths it is worth tracking.
+
+        :param positions: An (n, 2) array of positions.
+        :param chunk_size: Roughly how many position/line pairs to project at a time, to keep memory bounded.
+        :return: (line_indices, distances, closest_points) as (n,) arrays and an (n, 2) array.
+        """
+        import numpy as np
+
+        arrays = self.get_arrays()
+        starts, lines, line_dots = arrays["starts"][None], arrays["lines"][None], arrays["line_dots"][None]
+
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        line_indices = np.zeros(len(positions), dtype=np.intp)
+        smallest_distances = np.zeros(len(positions), dtype=np.float64)
+        closest_points = np.zeros((len(positions), 2), dtype=np.float64)
+
+        step = max(1, chunk_size // starts.shape[1])
+        for first in range(0, len(positions), step):
+            chunk = positions[first:first + step]
+            points_on_lines, distances = Path.project(chunk, starts, lines, line_dots)
+
+            # argmin picks the first of equally close lines, just like get_closest_line
+            closest = distances.argmin(axis=1)
+            everything = np.arange(len(chunk))
+            line_indices[first:first + step] = closest
+            smallest_distances[first:first + step] = distances[everything, closest]
+            closest_points[first:first + step] = points_on_lines[everything, closest]
+
+        return line_indices, smallest_distances, closest_points
+
+    def track_closest_lines(self, positions, last_lines, windows, thresholds):
+        """
+        The batched version of track_closest_line. Each position is only projected onto the lines in its window, and
+        the positions that have no last line or are too far from their window are projected onto every line.
+
+        :param positions: An (n, 2) array of positions.
+        :param last_lines: An (n,) array of the closest line of each position last tick, or -1 to search the whole path.
+        :param windows: An (n,) array of how many lines to check on either side of each last line.
+        :param thresholds: An (n,) array of the distance past which each window's result is thrown away.
+        :return: (line_indices, distances, closest_points) as (n,) arrays and an (n, 2) array.
+        """
+        import numpy as np
+
+        arrays = self.get_arrays()
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        line_indices = np.zeros(len(positions), dtype=np.intp)
+        smallest_distances = np.zeros(len(positions), dtype=np.float64)
+        closest_points = np.zeros((len(positions), 2), dtype=np.float64)
+
+        tracked = np.flatnonzero(last_lines >= 0)
+        if tracked.size:
+            # The lines of every window, in order, with the ones outside of the window or the path left out
+            windows = np.asarray(windows, dtype=np.intp)[tracked]
+            offsets = np.arange(-windows.max(), windows.max() + 1)
+            candidates = np.asarray(last_lines, dtype=np.intp)[tracked, None] + offsets
+            valid = (np.abs(offsets) <= windows[:, None]) & (candidates >= 0) & (candidates < len(arrays["lines"]))
+            candidates = np.clip(candidates, 0, len(arrays["lines"]) - 1)
+
+            points_on_lines, distances = Path.project(
+                positions[tracked], arrays["starts"][candidates], arrays["lines"][candidates],
+                arrays["line_dots"][candidates]
+            )
+            distances[~valid] = np.inf
+
+            closest = distances.argmin(axis=1)
+            everything = np.arange(len(tracked))
+            line_indices[tracked] = candidates[everything, closest]
+            smallest_distances[tracked] = distances[everything, closest]
+            closest_points[tracked] = points_on_lines[everything, closest]
+
+        lost = np.flatnonzero((last_lines < 0) | (smallest_distances > thresholds))
+        if lost.size:
+            line_indices[lost], smallest_distances[lost], closest_points[lost] = self.get_closest_lines(positions[lost])
+
+        return line_indices, smallest_distances, closest_points
+
+    def get_line_params(self, line_indices, closest_points):
+        """
+        The batched version of get_line_param.
+
+        :param line_indices: An (n,) array of the line each point is on.
+        :param closest_points: An (n, 2) array of points on those lines.
+        :return: An (n,) array of params.
+        """
+        import numpy as np
+
+        arrays = self.get_arrays()
+        along = closest_points - arrays["starts"][line_indices]
+        distances_along_lines = np.sqrt((along * along).sum(axis=1))
+        lengths = arrays["lengths"][line_indices]
+        percentage = np.divide(
+            distances_along_lines, lengths, out=np.zeros_like(distances_along_lines), where=lengths != 0
+        )
+        return arrays["cumulative_distances"][line_indices] + percentage * arrays["relative_distances"][line_indices]
+
+    def get_params(self, positions, chunk_size=1 << 20):
+        """
+        The batched version of get_param. Every position is projected onto every line at once.
+
+        :param positions: An (n, 2) array of positions.
+        :param chunk_size: Roughly how many position/line pairs to project at a time, to keep memory bounded.
+        :return: (params, closest_points) as an (n,) array and an (n, 2) array.
+        """
+        line_indices, _, closest_points = self.get_closest_lines(positions, chunk_size)
+        return self.get_line_params(line_indices, closest_points), closest_points
+
+    def get_positions(self, params):
+        """
+        The batched version of get_position.
+
+        :param params: An (n,) array of params.
+        :return: An (n, 2) array of positions on the path.
+        """
+        import numpy as np
+
+        arrays = self.get_arrays()
+        cumulative_distances = arrays["cumulative_distances"]
+
+        params = np.clip(np.asarray(params, dtype=np.float64), 0.0, 1.0)
+        line_indices = np.searchsorted(cumulative_distances[1:-1], params, side="left")
+
+        relative_distances = arrays["relative_distances"][line_indices]
+        percentage = np.divide(
+            params - cumulative_distances[line_indices], relative_distances,
+            out=np.zeros_like(params), where=relative_distances != 0
+        )
+        np.clip(percentage, 0.0, 1.0, out=percentage)
+
+        # The same weighted average as Vector.lerp
+        first = arrays["starts"][line_indices]
+        second = arrays["ends"][line_indices]
+        return second * percentage[:, None] + first * (1 - percentage)[:, None]
+
 
 def main():
     path = Path((0, 0), (10, 10), (50, 0))
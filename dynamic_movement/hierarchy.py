@@ -0,0 +1,215 @@
+from dynamic_movement.geometry import Path
+from dynamic_movement.pathfinding import build_adjacency
+from array import array
+from collections import deque
+from heapq import heappush, heappop
+import math
+
+
+class ClusterGraph:
+    """
+    A hierarchical path finder for very large grid mazes, in the style of HPA*.
+
+    The grid is split into square clusters of cells. Wherever a passage crosses from one cluster into another, the
+    cells on both sides of it become entrances, and the distances between the entrances of each cluster are found
+    once up front. Paths are then found on the much smaller graph of entrances, and only turned back into cells when
+    they are needed.
+    """
+    def __init__(self, points, edges, extents, cell_size, cluster_size=16):
+        """
+        :param points: The center of every cell, as returned by Maze.get_points.
+        :param edges: (i, j) pairs of cells that are connected, such as the connected_edges of a maze.
+        :param extents: The [min, max] of both the x and y coordinates of the maze.
+        :param cell_size: The width of each cell.
+        :param cluster_size: The width of each cluster in cells.
+        """
+        self.points = points
+        self.cells_per_line = int((extents[1] - extents[0]) / cell_size)
+        self.cluster_size = cluster_size
+        self.clusters_per_line = math.ceil(self.cells_per_line / cluster_size)
+        self.adjacency = build_adjacency(len(points), edges)
+
+        # The cluster of every cell
+        cells_per_line, clusters_per_line = self.cells_per_line, self.clusters_per_line
+        self.clusters = array("q", [
+            (cell // cells_per_line // cluster_size) * clusters_per_line + cell % cells_per_line // cluster_size
+            for cell in range(len(points))
+        ])
+
+        # The entrances of every cluster, and the (entrance, cost) pairs each entrance is connected to
+        self.entrances = {}
+        self.links = {}
+
+        # Passages between clusters
+        for cell, neighbors in enumerate(self.adjacency):
+            for neighbor in neighbors:
+                if neighbor > cell and self.clusters[neighbor] != self.clusters[cell]:
+                    for entrance, other in ((cell, neighbor), (neighbor, cell)):
+                        if entrance not in self.links:
+                            self.links[entrance] = []
+                            self.entrances.setdefault(self.clusters[entrance], []).append(entrance)
+                        self.links[entrance].append((other, 1))
+
+        # Paths between the entrances within each cluster
+        for cluster_entrances in self.entrances.values():
+            for entrance in cluster_entrances:
+                distances, _ = self.search_cluster(entrance)
+                for other in cluster_entrances:
+                    if other != entrance and other in distances:
+                        self.links[entrance].append((other, distances[other]))
+
+    def get_position(self, cell):
+        """
+        Returns the column and row of a cell.
+        """
+        return cell % self.cells_per_line, cell // self.cells_per_line
+
+    def search_cluster(self, start_index, end_index=None):
+        """
+        Runs a breadth first search from a cell that never leaves its cluster.
+        :param end_index: If set, the search stops once this cell is reached.
+        :return: (distances, previous), dicts with the distance of every cell that was reached and the cell it was
+            reached from.
+        """
+        adjacency, clusters = self.adjacency, self.clusters
+        cluster = clusters[start_index]
+
+        distances = {start_index: 0}
+        previous = {start_index: start_index}
+        todo = deque([start_index])
+        while todo:
+            current = todo.popleft()
+            if current == end_index:
+                break
+            for neighbor in adjacency[current]:
+                if neighbor not in distances and clusters[neighbor] == cluster:
+                    distances[neighbor] = distances[current] + 1
+                    previous[neighbor] = current
+                    todo.append(neighbor)
+        return distances, previous
+
+    def find_path(self, start_index, end_index):
+        """
+        Finds a path between two cells on the graph of entrances. Nothing is turned into cells yet.
+        :return: A ClusterPath from start_index to end_index.
+        """
+        if self.clusters[start_index] == self.clusters[end_index]:
+            distances, _ = self.search_cluster(start_index, end_index)
+            if end_index in distances:
+                return ClusterPath(self, [start_index, end_index])
+
+        # The start and end are linked to the entrances of their clusters for just this search
+        distances, _ = self.search_cluster(start_index)
+        start_links = [
+            (entrance, distances[entrance])
+            for entrance in self.entrances.get(self.clusters[start_index], []) if entrance in distances
+        ]
+        distances, _ = self.search_cluster(end_index)
+        end_links = {
+            entrance: distances[entrance]
+            for entrance in self.entrances.get(self.clusters[end_index], []) if entrance in distances
+        }
+
+        end_x, end_y = self.get_position(end_index)
+
+        def estimate(cell):
+            # The Manhattan distance in cells, which a path can never be shorter than
+            x, y = self.get_position(cell)
+            return abs(end_x - x) + abs(end_y - y)
+
+        costs = {start_index: 0}
+        previous = {start_index: start_index}
+        todo = [(estimate(start_index), 0, start_index)]
+        while todo:
+            _, cost, current = heappop(todo)
+            if current == end_index:
+                break
+            if cost > costs[current]:
+                continue
+
+            links = self.links.get(current, [])
+            if current == start_index:
+                links = links + start_links
+            if current in end_links:
+                links = links + [(end_index, end_links[current])]
+
+            for neighbor, link_cost in links:
+                neighbor_cost = cost + link_cost
+                if neighbor_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = neighbor_cost
+                    previous[neighbor] = current
+                    heappush(todo, (neighbor_cost + estimate(neighbor), neighbor_cost, neighbor))
+        else:
+            raise ValueError(f"There is no path from {start_index} to {end_index}!")
+
+        nodes = [end_index]
+        while nodes[-1] != start_index:
+            nodes.append(previous[nodes[-1]])
+        nodes.reverse()
+        return ClusterPath(self, nodes)
+
+    def refine(self, start_index, end_index):
+        """
+        Returns the cells between two consecutive nodes of a ClusterPath, without start_index but with end_index.
+        """
+        if self.clusters[start_index] != self.clusters[end_index]:
+            # The two sides of a passage between clusters
+            return [end_index]
+
+        _, previous = self.search_cluster(start_index, end_index)
+        cells = [end_index]
+        while cells[-1] != start_index:
+            cells.append(previous[cells[-1]])
+        cells.pop()
+        cells.reverse()
+        return cells
+
+
+class ClusterPath:
+    """
+    A path through a ClusterGraph that is turned into cells a piece at a time, as a mover gets close to each piece.
+    """
+    def __init__(self, graph, nodes):
+        """
+        :param graph: The ClusterGraph the path was found on.
+        :param nodes: The start, the entrances the path goes through, and the end.
+        """
+        self.graph = graph
+        self.nodes = nodes
+
+        self.cells = [nodes[0]]
+        self.refined_nodes = 1
+
+    def is_refined(self):
+        return self.refined_nodes == len(self.nodes)
+
+    def refine(self, segments=1):
+        """
+        Turns the next pieces of the path into cells.
+        :param segments: How many of the remaining pieces between nodes to refine.
+        :return: The cells that were added.
+        """
+        added = []
+        for _ in range(segments):
+            if self.is_refined():
+                break
+            added += self.graph.refine(self.nodes[self.refined_nodes - 1], self.nodes[self.refined_nodes])
+            self.refined_nodes += 1
+        self.cells += added
+        return added
+
+    def refine_all(self):
+        self.refine(len(self.nodes))
+        return self.cells
+
+    def get_points(self):
+        """
+        Returns the centers of the cells that have been refined so far.
+        """
+        return [self.graph.points[cell] for cell in self.cells]
+
+    def get_path(self):
+        """
+        Returns a Path through the cells that have been refined so far, which needs to be at least two cells.
+        """
+        return Path(*self.get_points())
@@ -0,0 +1,251 @@
+from dynamic_movement.geometry import point_segment_distance, WallSegments
+from array import array
+import math, random, re
+
+# The bits of Maze.passages. Each cell only stores the passages to its right and below it, the passages to its left
+# and above it are stored by the cells on the other side of them.
+RIGHT = 1
+DOWN = 2
+
+
+class Maze:
+    """
+    A maze carved out of a square grid of cells with a randomized depth first search.
+
+    Cells are numbered row by row, so cell i is at column i % cells_per_line and row i // cells_per_line. Everything
+    about the maze is kept in flat arrays indexed by cell, so it stays small and fast to carve for millions of cells.
+    """
+    def __init__(self, extents, cell_size, seed=None):
+        """
+        Carves a new maze.
+        :param extents: The [min, max] of both the x and y coordinates of the maze.
+        :param cell_size: The width of each cell.
+        :param seed: The seed of the random number generator. Without one the random module itself is used, so that
+            random.seed() still decides the maze.
+        """
+        self.extents = extents
+        self.cell_size = cell_size
+        self.cells_per_line = int((extents[1] - extents[0]) / cell_size)
+        self.rows = len(range(*extents, cell_size))
+        self.cell_count = self.rows ** 2
+        self.random = random if seed is None else random.Random(seed)
+
+        # Which of the RIGHT and DOWN passages of each cell are open
+        self.passages = bytearray(self.cell_count)
+        # The order the cells were carved in, and the cell each one was carved from
+        self.order = array("q")
+        self.parents = array("q", bytes(8 * self.cell_count))
+
+        self.carve()
+
+    def carve(self):
+        """
+        Carves the passages of the maze, starting from a random cell.
+
+        The random numbers are drawn in the same order as the original list based generator, so a given seed still
+        makes the same maze.
+        """
+        cells_per_line, cell_count = self.cells_per_line, self.cell_count
+        shuffle = self.random.shuffle
+        passages, parents, order = self.passages, self.parents, self.order
+        visited = bytearray(cell_count)
+
+        start = self.random.randint(0, cell_count - 1)
+        todo = [(start, start)]
+        while todo:
+            previous, current = todo.pop(-1)
+            if visited[current]:
+                continue
+            visited[current] = 1
+
+            check = [current + cells_per_line, current - cells_per_line]
+            mod = current % cells_per_line
+            if mod != cells_per_line - 1:
+                check.append(current + 1)
+            if mod != 0:
+                check.append(current - 1)
+
+            shuffle(check)
+            for i in check:
+                if 0 <= i < cell_count and not visited[i]:
+                    todo.append((current, i))
+
+            order.append(current)
+            parents[current] = previous
+
+            # Opening the passage between the previous cell and this one
+            low, difference = min(previous, current), abs(current - previous)
+            if difference == 1:
+                passages[low] |= RIGHT
+            elif difference == cells_per_line:
+                passages[low] |= DOWN
+
+    def is_open(self, i, j):
+        """
+        Returns whether there is a passage between the neighboring cells i and j.
+        """
+        if i > j:
+            i, j = j, i
+        if j - i == 1:
+            return bool(self.passages[i] & RIGHT)
+        if j - i == self.cells_per_line:
+            return bool(self.passages[i] & DOWN)
+        return False
+
+    def get_neighbors(self, cell):
+        """
+        Returns the cells that are connected to a cell by a passage.
+        """
+        passages, cells_per_line = self.passages, self.cells_per_line
+        neighbors = []
+        if passages[cell] & RIGHT:
+            neighbors.append(cell + 1)
+        if passages[cell] & DOWN:
+            neighbors.append(cell + cells_per_line)
+        if cell % cells_per_line != 0 and passages[cell - 1] & RIGHT:
+            neighbors.append(cell - 1)
+        if cell >= cells_per_line and passages[cell - cells_per_line] & DOWN:
+            neighbors.append(cell - cells_per_line)
+        return neighbors
+
+    def get_walls(self, column, row):
+        """
+        Returns the sides of a cell that are walls as ((x1, y1), (x2, y2)) segments. The edges of the maze are walls too.
+        """
+        cells_per_line, passages = self.cells_per_line, self.passages
+        cell = row * cells_per_line + column
+        x1 = self.extents[0] + column * self.cell_size
+        y1 = self.extents[0] + row * self.cell_size
+        x2, y2 = x1 + self.cell_size, y1 + self.cell_size
+
+        walls = []
+        if column + 1 >= cells_per_line or not passages[cell] & RIGHT:
+            walls.append(((x2, y1), (x2, y2)))
+        if row + 1 >= self.rows or not passages[cell] & DOWN:
+            walls.append(((x1, y2), (x2, y2)))
+        if column == 0 or not passages[cell - 1] & RIGHT:
+            walls.append(((x1, y1), (x1, y2)))
+        if row == 0 or not passages[cell - cells_per_line] & DOWN:
+            walls.append(((x1, y1), (x2, y1)))
+        return walls
+
+    def get_wall_segments(self):
+        """
+        Returns the walls between cells, with walls that continue each other merged into one.
+
+        These are the same walls, in the same order, as WallSegments.merge on the walls main.generate_walls finds, but
+        the runs of walls are found by scanning each line of cells in the passage bitmap at once.
+        """
+        cells_per_line, passages = self.cells_per_line, self.passages
+        x0, size = self.extents[0], self.cell_size
+        walls = WallSegments()
+
+        # Runs of cells without a passage to their right (0 or DOWN), or without one below them (0 or RIGHT)
+        closed_right = re.compile(rb"[\x00\x02]+")
+        closed_down = re.compile(rb"[\x00\x01]+")
+
+        for column in range(cells_per_line - 1):
+            x = x0 + (column + 1) * size
+            for run in closed_right.finditer(bytes(passages[column::cells_per_line])):
+                walls.add(x, x0 + run.start() * size, x, x0 + run.end() * size)
+        for row in range(self.rows - 1):
+            y = x0 + (row + 1) * size
+            for run in closed_down.finditer(bytes(passages[row * cells_per_line:(row + 1) * cells_per_line])):
+                walls.add(x0 + run.start() * size, y, x0 + run.end() * size, y)
+        return walls
+
+    def is_clear(self, point1, point2, clearance=0):
+        """
+        Returns whether a straight line between two positions in the maze only goes through open passages, and stays
+        at least clearance away from every wall.
+
+        The cells along the line are walked one at a time, so this takes time proportional to the length of the line.
+        """
+        cells_per_line, rows = self.cells_per_line, self.rows
+        x1, y1 = (point1[0] - self.extents[0]) / self.cell_size, (point1[1] - self.extents[0]) / self.cell_size
+        x2, y2 = (point2[0] - self.extents[0]) / self.cell_size, (point2[1] - self.extents[0]) / self.cell_size
+
+        column, row = math.floor(x1), math.floor(y1)
+        end_column, end_row = math.floor(x2), math.floor(y2)
+        if not (0 <= column < cells_per_line and 0 <= row < rows and 0 <= end_column < cells_per_line
+                and 0 <= end_row < rows):
+            return False
+
+        # How far along the line the next column and row boundaries are, and how far apart they are
+        dx, dy = x2 - x1, y2 - y1
+        step_x, step_y = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+        next_x = (column + (dx > 0) - x1) / dx if dx else math.inf
+        next_y = (row + (dy > 0) - y1) / dy if dy else math.inf
+        delta_x = abs(1 / dx) if dx else math.inf
+        delta_y = abs(1 / dy) if dy else math.inf
+
+        cells = [(column, row)]
+        while (column, row) != (end_column, end_row):
+            cell = row * cells_per_line + column
+            if next_x < next_y:
+                if not self.is_open(cell, cell + step_x):
+                    return False
+                column += step_x
+                next_x += delta_x
+            elif next_y < next_x:
+                if not self.is_open(cell, cell + step_y * cells_per_line):
+                    return False
+                row += step_y
+                next_y += delta_y
+            else:
+                # Lines that go exactly through a corner are never clear
+                return False
+            cells.append((column, row))
+
+        if clearance > 0:
+            # Any wall closer than the clearance belongs to a cell within this many cells of the line
+            reach = math.ceil(clearance / self.cell_size)
+            nearby = {
+                (c, r)
+                for column, row in cells
+                for c in range(max(column - reach, 0), min(column + reach, cells_per_line - 1) + 1)
+                for r in range(max(row - reach, 0), min(row + reach, rows - 1) + 1)
+            }
+            for column, row in nearby:
+                for wall1, wall2 in self.get_walls(column, row):
+                    # The line doesn't cross any walls, so the closest points include an end of one of the segments
+                    distance = min(
+                        point_segment_distance(wall1, point1, point2),
+                        point_segment_distance(wall2, point1, point2),
+                        point_segment_distance(point1, wall1, wall2),
+                        point_segment_distance(point2, wall1, wall2),
+                    )
+                    if distance < clearance:
+                        return False
+        return True
+
+    def get_points(self):
+        """
+        Returns the center of every cell, in the order of the cells.
+        """
+        # Halving even sizes exactly keeps the centers whole numbers, like the corners of the cells
+        half = self.cell_size // 2 if self.cell_size % 2 == 0 else self.cell_size / 2
+        coordinates = range(*self.extents, self.cell_size)
+        return [(x + half, y + half) for y in coordinates for x in coordinates]
+
+    def get_edges(self):
+        """
+        Returns every pair of neighboring cells as (i, j) with i < j, whether or not there is a passage between them.
+        """
+        cells_per_line, cell_count = self.cells_per_line, self.cell_count
+        edges = []
+        for i in range(cell_count):
+            if i + 1 < cell_count and i % cells_per_line != cells_per_line - 1:
+                edges.append((i, i + 1))
+            j = i + cells_per_line
+            if j < cell_count:
+                edges.append((i, j))
+        return edges
+
+    def get_connected_edges(self):
+        """
+        Returns the passages as (i, j) pairs with i < j, in the order they were carved. The first one is the starting
+        cell paired with itself.
+        """
+        parents = self.parents
+        return [(min(parents[i], i), max(parents[i], i)) for i in self.order]
@@ -1,9 +1,68 @@
 from dynamic_movement import *
+from dynamic_movement.vector import Vector2
 
 class Target:
     def __init__(self, position: Vector = Vector(0, 0)):
         self.position = position
 
+
+def is_integral(value, vector=False):
+    """
+    Returns whether a value is a Python int, or for a Vector whether each of its components is.
+    """
+    if vector:
+        return isinstance(value.x, int), isinstance(value.y, int)
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def batched_state(name, vector=False):
+    """
+    Creates a property for a piece of Mover state that can either live on the Mover itself or in a MoverBatch.
+
+    Vector state that lives on the Mover is held in a Vector2 that is owned by the Mover, and assigning to it copies
+    the components over so the physics step can keep mutating it in place. Reading it returns a copy either way, so
+    a Vector that was read never changes as the Mover moves and changing it never changes the Mover. Assign to the
+    property to change the Mover.
+    Once a Mover is bound to a MoverBatch it becomes a view over its row of the batch's arrays. Values that would still
+    be ints on an unbound Mover, like the ones it was created with, are handed back as ints so they are written out the
+    same way.
+    :param name: The name of the attribute on the Mover and of the array on the MoverBatch.
+    :param vector: Whether the state is a Vector (a row of the array) or a scalar.
+    """
+    attribute = f"_{name}"
+
+    def getter(self):
+        if self._batch is None:
+            return getattr(self, attribute).copy() if vector else getattr(self, attribute)
+
+        value = getattr(self._batch, name)[self._batch_index]
+        integral = self._batch.integral.get(name)
+        if vector:
+            x, y = value.tolist()
+            if integral is not None:
+                integral_x, integral_y = integral[self._batch_index].tolist()
+                x, y = int(x) if integral_x else x, int(y) if integral_y else y
+            return Vector2(x, y)
+
+        value = value.item()
+        if integral is not None and integral[self._batch_index]:
+            return int(value)
+        return value
+
+    def setter(self, value):
+        if self._batch is None:
+            if vector:
+                getattr(self, attribute).set(value)
+            else:
+                setattr(self, attribute, value)
+        else:
+            getattr(self._batch, name)[self._batch_index] = value.as_tuple() if vector else value
+            if name in self._batch.integral:
+                self._batch.integral[name][self._batch_index] = is_integral(value, vector)
+
+    return property(getter, setter)
+
+
 class Mover(Target):
     """
     This class is an implementation of the Dynamic Mover to be used to test Dynamic Behaviors.
@@ -20,8 +79,18 @@ class Mover(Target):
             max_speed: float = 0,
             max_linear_acceleration: float = 0,
             max_angular_acceleration: float = 10000,
-            velocity: Vector = Vector(0, 0)
+            velocity: Vector = Vector(0, 0),
+            radius: float = 1
     ):
+        # The batch this Mover is a view over, if any. This must be set before any of the state is assigned.
+        self._batch = None
+        self._batch_index = -1
+
+        # The Vectors the Mover owns and updates in place
+        self._position = Vector2()
+        self._velocity = Vector2()
+        self._linear_acceleration = Vector2()
+
         super().__init__(position)
 
         self.id = id
@@ -41,6 +110,8 @@ class Mover(Target):
 
         self.max_angular_acceleration = max_angular_acceleration
 
+        # The Mover is a circle with this radius when checking for collisions
+        self.radius = radius
         self.collision_state = False
 
     def set_movement_behavior(self, movement_behavior):
@@ -49,9 +120,44 @@ class Mover(Target):
     def get_movement_behavior_id(self):
         return self.movement_behavior.id
 
-    def tick(self, delta):
+    def bind(self, batch, index):
         """
-        This function is used to tick the movement behavior and the physics step of the Mover.
+        This function turns the Mover into a view over a row of a MoverBatch.
+
+        The batch is expected to already hold this Mover's state in the given row.
+        :param batch: The MoverBatch that now owns this Mover's state.
+        :param index: The row of the batch's arrays that belongs to this Mover.
+        """
+        self._batch = batch
+        self._batch_index = index
+
+    def unbind(self):
+        """
+        This function copies the Mover's state out of its MoverBatch so that it can be simulated on its own again.
+        """
+        if self._batch is None:
+            return
+
+        state = {name: getattr(self, name) for name in Mover.batched_attributes}
+        self._batch = None
+        self._batch_index = -1
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __getstate__(self):
+        """
+        Movers in a MoverBatch are pickled with a copy of their own state instead of the whole batch.
+        """
+        state = self.__dict__.copy()
+        if self._batch is not None:
+            for name in Mover.batched_attributes:
+                state[f"_{name}"] = getattr(self, name)
+            state["_batch"], state["_batch_index"] = None, -1
+        return state
+
+    def steer(self, delta):
+        """
+        This function executes the movement behavior and stores the resulting accelerations without moving the Mover.
         :param delta: The amount of time during the step.
         """
         if not self.movement_behavior:
@@ -61,20 +167,52 @@ class Mover(Target):
         self.linear_acceleration = steering.linear
         self.angular_acceleration = steering.angular
 
+    def tick(self, delta):
+        """
+        This function is used to tick the movement behavior and the physics step of the Mover.
+        :param delta: The amount of time during the step.
+        """
+        self.steer(delta)
         self.physics_tick(delta)
 
     def physics_tick(self, delta):
         """
         This function performs a step of physics for a certain amount of time.
+
+        The Mover's Vectors are updated in place so that no new objects are allocated.
         :param delta: The time step between ticks.
         """
-        self.position += self.velocity * delta
-        self.orientation += self.rotation * delta
+        if self._batch is not None:
+            raise ValueError("Movers in a MoverBatch are moved by MoverBatch.physics_tick!")
+
+        self._position.scale_add(self._velocity, delta)
+        self._orientation += self._rotation * delta
 
-        self.velocity += self.linear_acceleration * delta
-        self.rotation += self.angular_acceleration * delta
+        self._velocity.scale_add(self._linear_acceleration, delta)
+        self._rotation += self._angular_acceleration * delta
 
-        if self.max_speed != 0 and self.velocity.magnitude() > self.max_speed:
-            self.velocity = self.velocity.normalize() * self.max_speed
+        if self._max_speed != 0:
+            self._velocity.clamp_length(self._max_speed)
 
     movement_id = property(get_movement_behavior_id)
+
+    # The state that is stored in a MoverBatch while the Mover is bound to one
+    batched_vectors = ("position", "velocity", "linear_acceleration")
+    batched_scalars = (
+        "orientation", "rotation", "angular_acceleration", "max_speed", "max_linear_acceleration", "radius"
+    )
+    batched_flags = ("collision_state",)
+    batched_attributes = batched_vectors + batched_scalars + batched_flags
+
+    position = batched_state("position", vector=True)
+    velocity = batched_state("velocity", vector=True)
+    linear_acceleration = batched_state("linear_acceleration", vector=True)
+
+    orientation = batched_state("orientation")
+    rotation = batched_state("rotation")
+    angular_acceleration = batched_state("angular_acceleration")
+    max_speed = batched_state("max_speed")
+    max_linear_acceleration = batched_state("max_linear_acceleration")
+    radius = batched_state("radius")
+
+    collision_state = batched_state("collision_state")
@@ -0,0 +1,182 @@
+from dynamic_movement.vector import Vector
+from array import array
+from collections import deque
+from heapq import heappush, heappop
+import math
+
+
+def build_adjacency(node_count, edges):
+    """
+    Turns a list of edges into a list of the neighbors of every node.
+    :param node_count: The amount of nodes. The nodes are numbered 0 to node_count - 1.
+    :param edges: (i, j) pairs of nodes that are connected. Edges from a node to itself are ignored.
+    """
+    adjacency = [[] for _ in range(node_count)]
+    for i, j in edges:
+        if i != j:
+            adjacency[i].append(j)
+            adjacency[j].append(i)
+    return adjacency
+
+
+class PathFinder:
+    """
+    Finds shortest paths through a graph of points, such as the cells of a maze, with A*.
+
+    The graph is turned into adjacency lists once, so any amount of paths can be found without going through the edges
+    again. Moving along an edge costs the Manhattan distance between its points, which is also the heuristic, so on a
+    grid every step costs the same and the heuristic never overestimates.
+    """
+    def __init__(self, points, edges):
+        """
+        :param points: The (x, y) position of every node.
+        :param edges: (i, j) pairs of nodes that are connected, such as the connected_edges of a maze.
+        """
+        self.points = points
+        self.adjacency = build_adjacency(len(points), edges)
+
+    def find_path(self, start_index, end_index):
+        """
+        Finds the shortest path between two nodes.
+
+        Only the nodes the search reaches are stored, so a short path in a huge graph stays cheap.
+        :return: The nodes along the path from end_index back to start_index, both included.
+        """
+        points, adjacency = self.points, self.adjacency
+        end_x, end_y = points[end_index]
+
+        distances = {start_index: 0}
+        previous = {start_index: start_index}
+        start_x, start_y = points[start_index]
+        todo = [(abs(end_x - start_x) + abs(end_y - start_y), 0, start_index)]
+
+        while todo:
+            _, distance, current = heappop(todo)
+            if current == end_index:
+                break
+            # Nodes can be in the heap more than once, only the closest one matters
+            if distance > distances[current]:
+                continue
+
+            x, y = points[current]
+            for neighbor in adjacency[current]:
+                neighbor_x, neighbor_y = points[neighbor]
+                neighbor_distance = distance + abs(neighbor_x - x) + abs(neighbor_y - y)
+                if neighbor_distance < distances.get(neighbor, math.inf):
+                    distances[neighbor] = neighbor_distance
+                    previous[neighbor] = current
+                    estimate = neighbor_distance + abs(end_x - neighbor_x) + abs(end_y - neighbor_y)
+                    heappush(todo, (estimate, neighbor_distance, neighbor))
+        else:
+            raise ValueError(f"There is no path from {start_index} to {end_index}!")
+
+        path = [end_index]
+        while path[-1] != start_index:
+            path.append(previous[path[-1]])
+        return path
+
+
+class FlowField:
+    """
+    The way to go from every cell of a grid maze to reach a single goal cell.
+
+    One breadth first search from the goal finds the next cell on the shortest path from every cell, so any amount of
+    movers can find their way to the goal with a single lookup each.
+    """
+    def __init__(self, points, edges, goal_index, extents, cell_size):
+        """
+        :param points: The center of every cell, as returned by Maze.get_points.
+        :param edges: (i, j) pairs of cells that are connected, such as the connected_edges of a maze.
+        :param goal_index: The cell everything flows towards.
+        :param extents: The [min, max] of both the x and y coordinates of the maze.
+        :param cell_size: The width of each cell.
+        """
+        self.points = points
+        self.goal_index = goal_index
+        self.extents = extents
+        self.cell_size = cell_size
+        self.cells_per_line = int((extents[1] - extents[0]) / cell_size)
+        self.rows = math.ceil(len(points) / self.cells_per_line)
+
+        # The next cell towards the goal and how many steps away the goal is, or -1 if it can't be reached
+        self.next_hops = array("q", [-1]) * len(points)
+        self.distances = array("q", [-1]) * len(points)
+        self.next_hops[goal_index] = goal_index
+        self.distances[goal_index] = 0
+
+        adjacency = build_adjacency(len(points), edges)
+        next_hops, distances = self.next_hops, self.distances
+        todo = deque([goal_index])
+        while todo:
+            current = todo.popleft()
+            for neighbor in adjacency[current]:
+                if distances[neighbor] == -1:
+                    distances[neighbor] = distances[current] + 1
+                    next_hops[neighbor] = current
+                    todo.append(neighbor)
+
+        self._arrays = None
+
+    def get_cell(self, position):
+        """
+        Returns the cell a position is in. Positions outside of the maze are treated as being in the closest cell.
+        """
+        column = math.floor((position.x - self.extents[0]) / self.cell_size)
+        row = math.floor((position.y - self.extents[0]) / self.cell_size)
+        column = min(max(column, 0), self.cells_per_line - 1)
+        row = min(max(row, 0), self.rows - 1)
+        return row * self.cells_per_line + column
+
+    def get_target(self, position):
+        """
+        Returns the center of the next cell towards the goal from a position. If the goal can't be reached from there,
+        this is the center of the position's own cell.
+        """
+        cell = self.get_cell(position)
+        next_hop = self.next_hops[cell]
+        return Vector(*self.points[next_hop if next_hop != -1 else cell])
+
+    def get_path(self, start_index):
+        """
+        Returns the cells from start_index to the goal, both included.
+        """
+        if self.next_hops[start_index] == -1:
+            raise ValueError(f"There is no path from {start_index} to {self.goal_index}!")
+
+        path = [start_index]
+        while path[-1] != self.goal_index:
+            path.append(self.next_hops[path[-1]])
+        return path
+
+    def get_arrays(self):
+        """
+        Returns the cell centers and the next cell of every cell as NumPy arrays for the batched queries, building
+        them once.
+        """
+        if self._arrays is None:
+            # Importing here so that NumPy is only required for batched queries
+            import numpy as np
+
+            cells = np.arange(len(self.points))
+            next_hops = np.frombuffer(self.next_hops, dtype=np.int64)
+            self._arrays = {
+                "points": np.array(self.points, dtype=np.float64),
+                # Cells that can't reach the goal just lead to themselves
+                "next_hops": np.where(next_hops == -1, cells, next_hops),
+            }
+        return self._arrays
+
+    def get_targets(self, positions):
+        """
+        The batched version of get_target.
+        :param positions: An (n, 2) array of positions.
+        :return: An (n, 2) array of the center of the next cell towards the goal from each position.
+        """
+        import numpy as np
+
+        arrays = self.get_arrays()
+        columns = np.floor((positions[:, 0] - self.extents[0]) / self.cell_size).astype(np.int64)
+        rows = np.floor((positions[:, 1] - self.extents[0]) / self.cell_size).astype(np.int64)
+        np.clip(columns, 0, self.cells_per_line - 1, out=columns)
+        np.clip(rows, 0, self.rows - 1, out=rows)
+        return arrays["points"][arrays["next_hops"][rows * self.cells_per_line + columns]]
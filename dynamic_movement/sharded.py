@@ -0,0 +1,208 @@
+"""
+Simulating a MoverBatch across several worker processes.
+
+The Movers are split into contiguous shards of rows, one per worker, and their state is kept in shared memory so that
+every worker can read the positions of every Mover. The state is double buffered: each tick the workers read one
+buffer and write the next state of their own rows into the other, then wait on a barrier for each other before
+swapping. Nothing a behavior reads is ever written during the same tick, so the results don't depend on the order the
+Movers are ticked in or on how many workers there are, and are the same as a single MoverBatch's.
+
+Only behaviors with a vectorized kernel in STEERING_KERNELS can be sharded. This module requires NumPy.
+"""
+import multiprocessing, pickle, threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+
+from dynamic_movement.batch import MoverBatch
+
+# The state that changes every tick and is double buffered, with the amount of columns of each array
+BUFFERED_STATE = (
+    ("position", 2), ("velocity", 2), ("linear_acceleration", 2),
+    ("orientation", 1), ("rotation", 1), ("angular_acceleration", 1)
+)
+
+
+class SharedState:
+    """
+    Two buffers of the changing state of a MoverBatch in one block of shared memory.
+    """
+    def __init__(self, count, name=None):
+        """
+        :param count: The amount of Movers.
+        :param name: The name of an existing block to attach to. Without one a new block is created.
+        """
+        self.count = count
+        columns = sum(width for _, width in BUFFERED_STATE)
+        size = max(2 * columns * count * 8, 1)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+
+        # Each buffer is a dict of arrays like the ones of a MoverBatch
+        self.buffers = []
+        offset = 0
+        for _ in range(2):
+            buffer = {}
+            for state, width in BUFFERED_STATE:
+                shape = (count, 2) if width == 2 else (count,)
+                buffer[state] = np.ndarray(shape, dtype=np.float64, buffer=self.memory.buf, offset=offset)
+                offset += width * count * 8
+            self.buffers.append(buffer)
+
+    def close(self):
+        # The arrays have to be gone before the memory under them can be closed
+        self.buffers = []
+        self.memory.close()
+
+
+def _run_shard(name, payload, start, stop, delta, ticks, barrier):
+    """
+    The loop of a worker process. It ticks the Movers in rows start to stop of the batch.
+    :param payload: The Movers and their behaviors, pickled by ShardedRunner.get_payload.
+    """
+    try:
+        movers, behaviors = pickle.loads(payload)
+        for mover, behavior in zip(movers, behaviors):
+            mover.movement_behavior = behavior
+
+        # The shared memory is let go of when the process exits, since the Movers keep views of it until then
+        state = SharedState(len(movers), name)
+        batch = MoverBatch(movers)
+        batch.group_behaviors(range(start, stop))
+        rows = slice(start, stop)
+
+        for tick in range(ticks):
+            current, following = state.buffers[tick % 2], state.buffers[(tick + 1) % 2]
+
+            # Behaviors read the current state and write their accelerations straight into the next one. Starting
+            # them out as the current ones keeps what behaviors like Continue don't change.
+            for acceleration in ("linear_acceleration", "angular_acceleration"):
+                following[acceleration][rows] = current[acceleration][rows]
+            batch.use_arrays({
+                **current,
+                "linear_acceleration": following["linear_acceleration"],
+                "angular_acceleration": following["angular_acceleration"]
+            })
+
+            batch.steer(delta)
+            batch.physics_tick(delta, rows, following)
+            barrier.wait()
+    except BaseException:
+        # Letting everyone else waiting on the barrier know that this tick will never finish
+        barrier.abort()
+        raise
+
+
+def _watch_workers(processes, barrier):
+    """
+    Breaks the barrier if any of the worker processes exits with an error, including before they ever reach it, so
+    that nobody waits on it forever.
+    """
+    sentinels = {process.sentinel: process for process in processes}
+    while sentinels:
+        for sentinel in wait(list(sentinels)):
+            process = sentinels.pop(sentinel)
+            process.join()
+            if process.exitcode != 0:
+                barrier.abort()
+                return
+
+
+class ShardedRunner:
+    """
+    Ticks the Movers of a MoverBatch in worker processes while this process handles the results of each tick.
+    """
+    def __init__(self, batch, workers=None):
+        """
+        :param batch: The MoverBatch to simulate. Its Movers are sent to the workers, so they have to be picklable.
+        :param workers: The amount of worker processes. Defaults to the amount of CPUs.
+        """
+        if batch.ungrouped:
+            raise ValueError("Only behaviors with a vectorized kernel can be simulated in shards!")
+
+        self.batch = batch
+        self.workers = max(min(workers or multiprocessing.cpu_count(), len(batch)), 1)
+
+    def get_shards(self):
+        """
+        Returns the (start, stop) rows of the shard of each worker. The shards are as close to the same size as they
+        can be.
+        """
+        count = len(self.batch)
+        bounds = [count * i // self.workers for i in range(self.workers + 1)]
+        return list(zip(bounds, bounds[1:]))
+
+    def get_payload(self):
+        """
+        Pickles the Movers and their behaviors once for all of the workers.
+
+        The behaviors are pickled after all of the Movers instead of along with them, since behaviors that target other
+        Movers would otherwise make pickle recurse down the whole chain of targets.
+        """
+        movers = self.batch.movers
+        behaviors = [mover.movement_behavior for mover in movers]
+        try:
+            for mover in movers:
+                mover.movement_behavior = None
+            return pickle.dumps((movers, behaviors), pickle.HIGHEST_PROTOCOL)
+        finally:
+            for mover, behavior in zip(movers, behaviors):
+                mover.movement_behavior = behavior
+
+    def run(self, delta, ticks):
+        """
+        Simulates a number of ticks. This is a generator that yields once for the state before every tick, with the
+        batch pointed at that state, while the workers compute the tick. The batch must not be changed in between.
+
+        Once it is done, the batch holds the state after the last tick.
+        :param delta: The time step between ticks.
+        :param ticks: The amount of ticks.
+        """
+        batch = self.batch
+        context = multiprocessing.get_context("spawn")
+        payload = self.get_payload()
+
+        # The workers and this process all wait on the barrier at the end of every tick
+        barrier = context.Barrier(self.workers + 1)
+        state = SharedState(len(batch))
+        processes = []
+        try:
+            for name in state.buffers[0]:
+                state.buffers[0][name][:] = getattr(batch, name)
+
+            for start, stop in self.get_shards():
+                process = context.Process(
+                    target=_run_shard, args=(state.name, payload, start, stop, delta, ticks, barrier)
+                )
+                process.start()
+                processes.append(process)
+            threading.Thread(target=_watch_workers, args=(processes, barrier), daemon=True).start()
+
+            for tick in range(ticks):
+                batch.use_arrays(state.buffers[tick % 2])
+                yield tick
+                try:
+                    barrier.wait()
+                except threading.BrokenBarrierError:
+                    raise RuntimeError("A worker of the sharded simulation failed!") from None
+
+                # Which values the workers left as ints isn't shared with this process, so from here on every value
+                # they compute is handed to the Movers as a float
+                if tick == 0:
+                    batch.mark_computed([name for name, _ in BUFFERED_STATE])
+
+            # Copying the final state out of the shared memory before it goes away
+            batch.use_arrays({name: array.copy() for name, array in state.buffers[ticks % 2].items()})
+        except BaseException:
+            barrier.abort()
+            # Keeping whatever state the batch was last pointed at
+            batch.use_arrays({name: getattr(batch, name).copy() for name, _ in BUFFERED_STATE})
+            raise
+        finally:
+            for process in processes:
+                process.join()
+            state.close()
+            state.memory.unlink()
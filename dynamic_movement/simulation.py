@@ -6,12 +6,29 @@ class Simulation:
     """
     An object used to simplify the simulation of the behaviors and used to handle the output of movement.
     """
-    def __init__(self, sim_name, time_step, movers, paths=None):
+    def __init__(
+            self, sim_name, time_step, movers, paths=None, batched=False, stream_output=False, output_format="txt",
+            collisions=False, double_buffered=False, workers=None
+    ):
         """
         The function that constructs a Simulation object.
 
         :param movers: A list of mover objects to tick and output in the simulation.
         :param time_step: The amount of time to simulate between each tick of the simulation.
+        :param batched: Whether to store the movers in a NumPy backed MoverBatch and step them all at once.
+        :param stream_output: Whether to write trajectories to disk as they are generated instead of all at the end.
+            Pass a dict to forward keyword arguments to OutputManager.open_trajectory_stream.
+        :param output_format: The format to write trajectories in, "txt" or the binary "npy" format of trajectory_io.
+        :param collisions: Whether to detect collisions between the movers every tick and set their collision_state.
+            Pass a CollisionSystem to configure it.
+        :param double_buffered: Whether every mover steers before any of them move, so that behaviors always see where
+            the other movers were at the start of the tick and the order of the movers doesn't matter. Batched
+            simulations always work this way.
+        :param workers: If set, the movers are split between this many worker processes that tick them at the same
+            time, which is double buffered and requires NumPy. Pass True for one per CPU. Every behavior needs a
+            vectorized kernel and the movers have to be picklable. After the first tick every value is written to
+            trajectories.txt as a float, even ones that stay whole numbers otherwise, like the accelerations of a
+            Continue.
         """
         self.sim_name = sim_name
 
@@ -24,7 +41,41 @@ class Simulation:
 
         self._total_time = 0
 
+        self.batched = batched
+        self.batch = None
+        self.double_buffered = double_buffered
+        self.workers = workers
+
+        self.collision_system = None
+        if collisions:
+            from dynamic_movement.collision import CollisionSystem
+
+            self.collision_system = collisions if isinstance(collisions, CollisionSystem) else CollisionSystem()
+
         self.output_manager: OutputManager = OutputManager.get_output_manager(f"output_data/{sim_name}")
+        self.output_format = output_format
+        if stream_output:
+            self.output_manager.open_trajectory_stream(
+                trajectory_format=output_format, **(stream_output if isinstance(stream_output, dict) else {})
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        This function lets go of the output of the simulation and of its MoverBatch, if it has one. Anything that
+        hasn't been written with write_output_files is thrown away.
+
+        The Simulation can be used in a with statement to close it at the end.
+        """
+        self.output_manager.close()
+        if self.batch is not None:
+            self.batch.release()
+            self.batch = None
 
     def add_mover(self, mover: Mover):
         self.movers.append(mover)
@@ -32,6 +83,24 @@ class Simulation:
     def add_path(self, path):
         self.paths.append(path)
 
+    def get_batch(self):
+        """
+        This function returns the MoverBatch holding the movers, rebuilding it if movers were added since the last call.
+
+        The movers are regrouped by behavior every time, in case any of their behaviors changed.
+        """
+        if self.batch is None or len(self.batch) != len(self.movers):
+            # Importing here so that NumPy is only required for batched simulations
+            from dynamic_movement.batch import MoverBatch
+
+            if self.batch is not None:
+                self.batch.release()
+            self.batch = MoverBatch(self.movers)
+        else:
+            self.batch.group_behaviors()
+
+        return self.batch
+
     def generate_line(self, time, mover: Mover):
         """
         This function adds a line for a single mover at a single moment to the output string.
@@ -39,20 +108,48 @@ class Simulation:
         :param time: The time of the simulation at this moment.
         :param mover: The mover to output the data on.
         """
+        # Each of these is a copy, so they are only read once
+        position, velocity, linear_acceleration = mover.position, mover.velocity, mover.linear_acceleration
         self.output_manager.write_trajectory(
             time,
             mover.id,
-            mover.position.x,
-            mover.position.y,
-            mover.velocity.x,
-            mover.velocity.y,
-            mover.linear_acceleration.x,
-            mover.linear_acceleration.y,
+            position.x,
+            position.y,
+            velocity.x,
+            velocity.y,
+            linear_acceleration.x,
+            linear_acceleration.y,
             mover.orientation,
             mover.movement_id,
             str(mover.collision_state).upper()
         )
 
+    def write_state(self, batch=None):
+        """
+        This function detects collisions and writes the state of every mover at the current moment to the output.
+
+        :param batch: The MoverBatch the movers are bound to, if any.
+        """
+        # The collision states written for this moment are for where the movers are at this moment
+        if self.collision_system is not None:
+            self.collision_system.update(self.movers, batch)
+
+        if batch is not None and self.output_format == "npy":
+            self.output_manager.write_trajectory_records(batch.get_records(self._total_time))
+        else:
+            for mover in self.movers:
+                self.generate_line(self._total_time, mover)
+
+    def get_tick_count(self, seconds):
+        """
+        This function returns how many ticks simulate runs for the given amount of time.
+        """
+        ticks, sim_time = 0, 0
+        while sim_time <= seconds:
+            ticks += 1
+            sim_time += self.time_step
+        return ticks
+
     def simulate(self, seconds):
         """
         This function simulates the given amount of time one time step at a time.
@@ -60,20 +157,67 @@ class Simulation:
         :param seconds: The amount of time to simulate.
         """
         start_time = time.time()
+        sim_time = self.simulate_sharded(seconds) if self.workers else self.simulate_ticks(seconds)
+        print(f"Simulated {sim_time:.3f} seconds of the simulation in {time.time() - start_time:.4f} seconds realtime.")
+
+    def simulate_ticks(self, seconds):
+        """
+        This function runs the ticks of simulate in this process.
+
+        :param seconds: The amount of time to simulate.
+        :return: The amount of time that was simulated.
+        """
+        batch = self.get_batch() if self.batched else None
         sim_time = 0
         while sim_time <= seconds:
+            self.write_state(batch)
+
+            if batch is not None:
+                # Every mover steers before any of them move, then they are all moved at once
+                batch.steer(self.time_step)
+                batch.physics_tick(self.time_step)
+            elif self.double_buffered:
+                # Every mover steers from where everything was at the start of the tick before any of them move
+                for mover in self.movers:
+                    mover.steer(self.time_step)
+                for mover in self.movers:
+                    mover.physics_tick(self.time_step)
+            else:
+                for mover in self.movers:
+                    mover.tick(self.time_step)
 
-            for mover in self.movers:
-                self.generate_line(self._total_time, mover)
-                mover.tick(self.time_step)
+            sim_time += self.time_step
+            self._total_time += self.time_step
+        return sim_time
+
+    def simulate_sharded(self, seconds):
+        """
+        This function is the version of simulate for when the movers are ticked by worker processes. This process writes
+        the output of each tick while the workers compute the next one.
+
+        :param seconds: The amount of time to simulate.
+        :return: The amount of time that was simulated.
+        """
+        from dynamic_movement.sharded import ShardedRunner
+
+        batch = self.get_batch()
+        runner = ShardedRunner(batch, None if self.workers is True else self.workers)
+
+        sim_time = 0
+        for _ in runner.run(self.time_step, self.get_tick_count(seconds)):
+            self.write_state(batch)
 
             sim_time += self.time_step
             self._total_time += self.time_step
+        return sim_time
 
-        print(f"Simulated {sim_time:.3f} seconds of the simulation in {time.time() - start_time:.4f} seconds realtime.")
+    def write_output_files(self, output_format=None):
+        """
+        This function writes the trajectories and paths of the simulation to its output folder.
 
-    def write_output_files(self):
+        :param output_format: The format to write trajectories in, "txt" or "npy". Defaults to the Simulation's.
+        """
         if self.paths:
             self.output_manager.write_path(*self.paths)
 
-        self.output_manager.write_output_files()
+        self.output_manager.write_output_files(output_format or self.output_format)
@@ -16,6 +16,8 @@ class Vector:
 
     :author: Ben Morrison
     """
+    __slots__ = ("values",)
+
     def __init__(self, *values):
         if isinstance(values, tuple):
             values = list(values)
@@ -106,3 +108,110 @@ class Vector:
     x = property(get_x)
     y = property(get_y)
     z = property(get_z)
+
+
+class Vector2(Vector):
+    """
+    A fixed size, mutable 2D Vector for code that runs every tick.
+
+    It supports all of the operators of Vector, which still return new objects, along with in-place methods that
+    mutate the Vector without allocating anything. The in-place methods return the Vector so they can be chained.
+    """
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    def __len__(self):
+        return 2
+
+    def __add__(self, other):
+        if isinstance(other, Vector):
+            return Vector2(self.x + other.x, self.y + other.y)
+        return Vector2(other + self.x, other + self.y)
+
+    def __sub__(self, other):
+        if isinstance(other, Vector):
+            return Vector2(self.x - other.x, self.y - other.y)
+        return Vector2(other - self.x, other - self.y)
+
+    def __mul__(self, other):
+        if isinstance(other, Vector):
+            return self.x * other.x + self.y * other.y
+        return Vector2(other * self.x, other * self.y)
+
+    def __truediv__(self, other):
+        return Vector2(self.x / other, self.y / other)
+
+    def __getitem__(self, item):
+        return self.values[item]
+
+    def get_values(self):
+        return self.x, self.y
+
+    def magnitude(self):
+        return (self.x * self.x + self.y * self.y) ** (1/2)
+
+    def as_tuple(self):
+        return self.x, self.y
+
+    def copy(self):
+        return Vector2(self.x, self.y)
+
+    def __reduce__(self):
+        # The values slot of Vector is replaced by a property, so the default pickling of slots can't restore it
+        return Vector2, (self.x, self.y)
+
+    def set(self, other):
+        """
+        Copies the components of another Vector into this one.
+        :param other: Any 2D Vector.
+        """
+        self.x = other.x
+        self.y = other.y
+        return self
+
+    def iadd(self, other):
+        """
+        Adds another Vector to this one in place.
+        """
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def isub(self, other):
+        """
+        Subtracts another Vector from this one in place.
+        """
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def scale(self, scalar):
+        """
+        Multiplies this Vector by a scalar in place.
+        """
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def scale_add(self, other, scalar):
+        """
+        Adds other * scalar to this Vector in place, like position += velocity * delta.
+        """
+        self.x += scalar * other.x
+        self.y += scalar * other.y
+        return self
+
+    def clamp_length(self, max_length):
+        """
+        Shrinks this Vector in place so that its magnitude is at most max_length.
+        """
+        length = self.magnitude()
+        if length > max_length:
+            self.x = max_length * (self.x / length)
+            self.y = max_length * (self.y / length)
+        return self
+
+    values = property(get_values)
@@ -14,119 +14,57 @@ Class: CS 330-01 (Fall '22)
 Date: 9/11/2022
 """
 from dynamic_movement import *
+from output import OutputManager
 import math, random
-from random import randint, shuffle
+from random import randint
 
 pi = 3.14
 
-def generate_maze(extents, cell_size):
-    cells_per_line = int((extents[1] - extents[0]) / cell_size)
-    points = [(x + 5, y + 5) for y in range(*extents, cell_size) for x in range(*extents, cell_size) ]
-    edges = []
-    for i, point in enumerate(points):
-        if i + 1 < len(points) and i % cells_per_line != cells_per_line - 1:
-            edges.append((i, i + 1))
-        j = i + cells_per_line
-        if j < len(points):
-            edges.append((i, j))
-
-    start = randint(0, len(points) - 1)
-    todo = [(start, start)]
-    visited = []
-    connected_edges = []
-    while todo:
-        previous, current = todo.pop(-1)
-        if current not in visited:
-            visited.append(current)
-
-            check = [current + cells_per_line, current - cells_per_line]
-            mod = current % cells_per_line
-            if mod != cells_per_line - 1:
-                check.append(current + 1)
-            if mod != 0:
-                check.append(current - 1)
-
-            shuffle(check)
-            for i in check:
-                if 0 <= i < len(points) and i not in visited:
-                    todo.append((current, i))
-
-            if previous > current:
-                previous, current = current, previous
-            connected_edges.append((previous, current))
-
-    return points, edges, connected_edges
-
-def generate_walls(extents, cell_size, points, edges, connected_edges):
-    cells_per_line = int((extents[1] - extents[0]) / cell_size)
-
-    output_manager: OutputManager = OutputManager.get_output_manager()
-    # Drawing Walls
-    for edge in set(edges).difference(connected_edges):
-        i, j = edge
-        i, j = points[i], points[j]
-
-        xd, yd = j[0] - i[0], j[1] - i[1]
-
-        x1, y1 = i[0] + xd//2, i[1] + yd//2
-        x2, y2 = x1, y1
-        if xd == 0:
-            x1 -= cell_size // 2
-            x2 += cell_size // 2
-        if yd == 0:
-            y1 -= cell_size // 2
-            y2 += cell_size // 2
-
-        output_manager.write_line((x1, y1), (x2, y2))
+def generate_maze(extents, cell_size, seed=None):
+    maze = Maze(extents, cell_size, seed)
+    return maze.get_points(), maze.get_edges(), maze.get_connected_edges()
 
-def find_path(start_index, end_index, points, connected_edges):
-    # 1_000_000_000 is Inf as far as we're concerned
-    visited = []
-    distances = [1_000_000_000 for point in points]
-    previous = [-1 for point in points]
-
-    distances[start_index] = 0
-    current_index = start_index
-
-    while current_index != end_index:
+def generate_walls(extents, cell_size, points, edges, connected_edges, output_manager=None):
+    if output_manager is None:
+        output_manager: OutputManager = OutputManager.get_output_manager()
 
-        visited.append(current_index)
+    def unit_walls():
+        # Every edge between two cells that isn't a passage gets a wall
+        for edge in set(edges).difference(connected_edges):
+            i, j = edge
+            i, j = points[i], points[j]
 
-        neighbors = []
-        for edge in connected_edges:
-            if edge[0] == current_index:
-                neighbors.append(edge[1])
-            elif edge[1] == current_index:
-                neighbors.append(edge[0])
+            xd, yd = j[0] - i[0], j[1] - i[1]
 
-        current_distance = distances[current_index]
-        for neighbor in neighbors:
-            if neighbor not in visited:
-                if current_distance + 1 < distances[neighbor]:
-                    distances[neighbor] = current_distance + 1
-                    previous[neighbor] = current_index
+            x1, y1 = i[0] + xd//2, i[1] + yd//2
+            x2, y2 = x1, y1
+            if xd == 0:
+                x1 -= cell_size // 2
+                x2 += cell_size // 2
+            if yd == 0:
+                y1 -= cell_size // 2
+                y2 += cell_size // 2
 
-        closest_index, min_distance = 0, 1_000_000_000
-        for i, distance in enumerate(distances):
-            if distance < min_distance and i not in visited:
-                closest_index = i
-                min_distance = distances[closest_index]
+            yield (x1, y1), (x2, y2)
 
-        current_index = closest_index
+    # Drawing Walls, with the walls along the same line merged
+    walls = WallSegments.merge(unit_walls())
+    output_manager.write_walls(walls)
+    return walls
 
-    path = []
-    while current_index != start_index:
-        path.append(current_index)
-        current_index = previous[current_index]
-    path.append(current_index)
-
-    return path
+def find_path(start_index, end_index, points, connected_edges):
+    return PathFinder(points, connected_edges).find_path(start_index, end_index)
 
-def program_0():
+def program_0(max_speed=1, path_offset=None, time_step=0.5):
+    """
+    :param max_speed: The max speed of the mover.
+    :param path_offset: How far ahead on the path (as a param) the mover seeks. Defaults to 4 times its max speed.
+    :param time_step: The time between ticks of the simulation.
+    """
 
     program_name = "program_0"
 
-    sim = Simulation(program_name, 0.5, [], [])
+    sim = Simulation(program_name, time_step, [], [])
 
     # path_points = [mover.position]
     # angle = 1 / 4 * math.pi
@@ -150,29 +88,42 @@ def program_0():
     extents = 250
     extents, cell_size = [-extents, extents], 10
     points, edges, connected_edges = generate_maze(extents, cell_size)
-    generate_walls(extents, cell_size, points, edges, connected_edges)
-    path_points = [points[i] for i in find_path(randint(0, len(points)), randint(0, len(points)), points, connected_edges)]
+    walls = generate_walls(extents, cell_size, points, edges, connected_edges, sim.output_manager)
+    path_points = [points[i] for i in find_path(randint(0, len(points) - 1), randint(0, len(points) - 1), points, connected_edges)]
+    # Straight corridors become single lines, the shape of the path stays exactly the same
+    path_points = simplify_path(path_points)
 
     mover = Mover(
         0,
         position=Vector(*path_points[0]),
         velocity=Vector(0, 0),
-        max_speed=1,
+        max_speed=max_speed,
         max_linear_acceleration=0.25
     )
 
     path = Path(*path_points)
-    mover.set_movement_behavior(FollowPath(mover, path, 4 * mover.max_speed / path.path_length))
+    if path_offset is None:
+        path_offset = 4 * mover.max_speed / path.path_length
+    follow_path = FollowPath(mover, path, path_offset, tracking_window=2, tracking_threshold=cell_size)
+    # Steering away from any wall the mover is about to run into when following the path overshoots
+    mover.set_movement_behavior(ObstacleAvoidance(mover, walls.get_segment_grid(), follow_path))
     sim.add_mover(mover)
     sim.add_path(path)
 
     sim.simulate(int(path.path_length / mover.max_speed))
 
     sim.write_output_files()
+    sim.close()
 
     return program_name
 
-def program_1():
+def program_1(max_speed=None, slow_radius=32, time_step=0.5):
+    """
+    :param max_speed: If set, the max speed of every mover that reacts to the Continue mover. Otherwise each one has
+        its own.
+    :param slow_radius: The slow radius of the Arrive.
+    :param time_step: The time between ticks of the simulation.
+    """
 
     program_name = "program_1"
 
@@ -189,7 +140,7 @@ def program_1():
         position=Vector(-30, -50),
         velocity=Vector(2, 7),
         orientation=pi/4,
-        max_speed=8,
+        max_speed=8 if max_speed is None else max_speed,
         max_linear_acceleration=1.5
     )
     mover.set_movement_behavior(Flee(mover, movers[0]))
@@ -201,47 +152,54 @@ def program_1():
         position=Vector(-50, 40),
         velocity=Vector(0, 8),
         orientation=3 * pi / 2,
-        max_speed=8,
+        max_speed=8 if max_speed is None else max_speed,
         max_linear_acceleration=2
     )
     mover.set_movement_behavior(Seek(mover, movers[0]))
     movers.append(mover)
 
-    # Instantiating the Mover that implements the Arrive
+    # Instantiating the Mover that implements the Arrive. Its max speed has to be right before the Arrive is made, since
+    # the Arrive keeps its own copy of it.
     mover = Mover(
         2604,
         position=Vector(50, 75),
         velocity=Vector(-9, 4),
         orientation=pi,
-        max_speed=10,
+        max_speed=10 if max_speed is None else max_speed,
         max_linear_acceleration=2
     )
-    mover.set_movement_behavior(Arrive(mover, movers[0], 4, 32, 1))
+    mover.set_movement_behavior(Arrive(mover, movers[0], 4, slow_radius, 1))
     movers.append(mover)
 
     # Instantiating the Simulation
-    sim = Simulation(program_name, 0.5, movers)
+    sim = Simulation(program_name, time_step, movers)
 
     # Simulating 50 seconds
     sim.simulate(50)
 
     sim.write_output_files()
+    sim.close()
 
     return program_name
 
-def program_2():
+def program_2(max_speed=4, path_offset=0.04, time_step=0.5):
+    """
+    :param max_speed: The max speed of the mover.
+    :param path_offset: How far ahead on the path (as a param) the mover seeks.
+    :param time_step: The time between ticks of the simulation.
+    """
 
     program_name = "program_2"
 
     movers = []
     paths = []
-    sim = Simulation(program_name, 0.5, movers, paths)
+    sim = Simulation(program_name, time_step, movers, paths)
 
     mover = Mover(
         id=2701,
         position=Vector(20, 95),
         velocity=Vector(0, 0),
-        max_speed=4,
+        max_speed=max_speed,
         max_linear_acceleration=2
     )
     path = geometry.Path(
@@ -256,7 +214,7 @@ def program_2():
     )
     paths.append(path)
     mover.set_movement_behavior(FollowPath(
-        mover, path, 0.04
+        mover, path, path_offset
     ))
     movers.append(mover)
 
@@ -264,6 +222,7 @@ def program_2():
     sim.simulate(125)
 
     sim.write_output_files()
+    sim.close()
 
     return program_name
 
@@ -1,33 +1,183 @@
-import os
+import contextvars, os, queue, threading
 
 class ParentOutputManagerNotInstantiated(BaseException):
-    message = f"In order to use OutputManager.__init__ without passing an output_path parameter," \
-              f" an OutputManager must be instantiated in advance."
+    message = f"In order to use OutputManager.get_output_manager without passing an output_path parameter," \
+              f" an OutputManager must be current, such as the one of a Simulation."
 
     def __init__(self):
         super().__init__(ParentOutputManagerNotInstantiated.message)
 
 
-class OutputManager:
-    managers = []
+class TrajectoryStream:
+    """
+    Writes lines straight to a file instead of holding the whole run in memory.
+
+    Lines are collected into a buffer that is written out in chunks, either directly or by a background thread that
+    is fed through a bounded queue, so memory use stays flat no matter how long the run is. If the background thread
+    fails to write, the error is raised by the next flush or close.
+    """
+    def __init__(self, file_path: str, buffer_lines: int = 4096, threaded: bool = False, queue_size: int = 8):
+        """
+        :param file_path: The file to write to. It is truncated when the stream is opened.
+        :param buffer_lines: How many lines to collect before writing them out.
+        :param threaded: Whether to write the chunks from a background thread.
+        :param queue_size: How many chunks can be waiting for the background thread before writing blocks.
+        """
+        self.file_path = file_path
+        self.file = open(file_path, "w+")
+        self.buffer_lines = buffer_lines
+        self.buffer = []
+
+        self.queue = None
+        self.thread = None
+        self.error = None  # What the background thread failed with, if it did
+        if threaded:
+            self.queue = queue.Queue(queue_size)
+            self.thread = threading.Thread(target=self._write_chunks, daemon=True)
+            self.thread.start()
+
+    def _write_chunks(self):
+        while (chunk := self.queue.get()) is not None:
+            # After an error the chunks are still taken off the queue, so that putting more on it never blocks
+            if self.error is None:
+                try:
+                    self.file.write(chunk)
+                except Exception as error:
+                    self.error = error
 
+    def raise_error(self):
+        """
+        Raises whatever the background thread failed to write with, in the thread that is using the stream.
+        """
+        if self.error is not None:
+            raise self.error
+
+    def write(self, line: str):
+        self.buffer.append(line)
+        if len(self.buffer) >= self.buffer_lines:
+            self.flush()
+
+    def flush(self):
+        self.raise_error()
+        if not self.buffer:
+            return
+
+        chunk = "".join(self.buffer)
+        self.buffer = []
+        if self.queue is not None:
+            self.queue.put(chunk)
+        else:
+            self.file.write(chunk)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self.thread is not None:
+                self.queue.put(None)
+                self.thread.join()
+                self.thread = None
+            self.file.close()
+        self.raise_error()
+
+
+# The OutputManager of the Simulation that was most recently set up in this context. Every thread and asyncio task has
+# its own, so Simulations that run side by side never share one.
+current_output_manager = contextvars.ContextVar("current_output_manager", default=None)
+
+
+class OutputManager:
     @classmethod
     def get_output_manager(cls, manager_path: str = None):
+        """
+        :param manager_path: If given, a new OutputManager that writes to this folder is created and made current.
+        :return: The new OutputManager, or the current one if no manager_path was given.
+        """
         if not manager_path:
-            if not OutputManager.managers:
+            manager = OutputManager.get_current()
+            if manager is None:
                 raise ParentOutputManagerNotInstantiated()
-            return OutputManager.managers[0]
+            return manager
         else:
-            OutputManager.managers.append(OutputManager(manager_path))
-            return OutputManager.managers[-1]
+            manager = OutputManager(manager_path)
+            manager.make_current()
+            return manager
+
+    @staticmethod
+    def get_current():
+        """
+        :return: The current OutputManager, or None if there isn't one. Managers that were closed, such as by another
+            thread, are never returned, the one that was current before them is.
+        """
+        while (manager := current_output_manager.get()) is not None and manager.closed:
+            manager.restore_previous()
+        return manager
+
+    def make_current(self):
+        """
+        Makes get_output_manager return this OutputManager in the current context, until it is closed.
+        """
+        self._token = current_output_manager.set(self)
 
     def __init__(self, output_path: str = None):
 
+        # Every output file is held as a list of lines until it is written
         self.data = {}
         self.output_path = output_path
 
         self._path_count = 0
 
+        # What make_current replaced, so that closing puts it back
+        self._token = None
+        self.closed = False
+
+        # WallSegments that are formatted straight into paths.txt when it is written
+        self.walls = []
+
+        # Trajectories are held as rows so that the format can still be picked when they are written
+        self.trajectory_rows = []
+        self.trajectory_stream = None
+        self.trajectory_format = "txt"
+
+    def create_output_directory(self):
+        try:
+            os.makedirs(self.output_path)
+            print(f"Created directory \"{self.output_path}\".")
+        except FileExistsError:
+            print(f"Directory \"{self.output_path}\" exists already.")
+
+    def open_trajectory_stream(self, buffer_lines: int = 4096, threaded: bool = False, trajectory_format: str = "txt"):
+        """
+        Makes write_trajectory write straight to the trajectories file instead of holding every row until
+        write_output_files is called.
+        :param buffer_lines: How many rows to collect before writing them out.
+        :param threaded: Whether to write from a background thread. Only used by the text format.
+        :param trajectory_format: "txt" for trajectories.txt, or "npy" for the binary format in trajectory_io.
+        """
+        self.create_output_directory()
+        self.trajectory_format = trajectory_format
+        file_path = f"{self.output_path}/trajectories.{trajectory_format}"
+        if trajectory_format == "npy":
+            from trajectory_io import TrajectoryRecordWriter
+
+            self.trajectory_stream = TrajectoryRecordWriter(file_path, buffer_lines)
+        else:
+            self.trajectory_stream = TrajectoryStream(file_path, buffer_lines, threaded)
+
+    @staticmethod
+    def format_trajectory(row) -> str:
+        """
+        Formats a row of trajectory data as a line of trajectories.txt.
+        """
+        string_data = []
+        for element in row:
+            if isinstance(element, float):
+                string_data.append(f"{element:10.3f}")
+            else:
+                string_data.append(f"{element:10}")
+
+        return ", ".join(string_data) + "\n"
+
     def write_trajectory(
             self,
             time: float,
@@ -43,67 +193,129 @@ class OutputManager:
             mover_collision_state: str
     ):
 
-        data = [
+        row = (
             time, mover_id, mover_position_x, mover_position_y, mover_velocity_x, mover_velocity_y,
             mover_linear_acceleration_x, mover_linear_acceleration_y, mover_orientation, mover_movement_id,
             mover_collision_state
-        ]
+        )
 
-        string_data = []
-        for element in data:
-            if isinstance(element, float):
-                string_data.append(f"{element:10.3f}")
-            else:
-                string_data.append(f"{element:10}")
+        if self.trajectory_stream is None:
+            self.trajectory_rows.append(row)
+        elif self.trajectory_format == "npy":
+            self.trajectory_stream.write(row)
+        else:
+            self.trajectory_stream.write(OutputManager.format_trajectory(row))
 
-        if "trajectories" not in self.data:
-            self.data["trajectories"] = ""
+    def write_trajectory_records(self, records):
+        """
+        Writes a whole array of trajectory records at once, like those built by a batched Simulation.
+        :param records: An array with the dtype trajectory_io.TRAJECTORY_DTYPE.
+        """
+        if self.trajectory_format == "npy" and self.trajectory_stream is not None:
+            self.trajectory_stream.write_records(records)
+            return
 
-        self.data["trajectories"] += ", ".join(string_data) + "\n"
+        for row in records.tolist():
+            # The collision state is written as TRUE or FALSE, just like Simulation.generate_line does
+            row = row[:-1] + (str(row[-1]).upper(),)
+            if self.trajectory_stream is None:
+                self.trajectory_rows.append(row)
+            else:
+                self.trajectory_stream.write(OutputManager.format_trajectory(row))
 
     def write_path(self, *paths):  # paths: [Path]
-        if "paths" not in self.data:
-            self.data["paths"] = ""
-
         for path in paths:
-            self.data["paths"] += f"path, {self._path_count}"
+            line = f"path, {self._path_count}"
 
             for i in range(len(path.points)):
-                self.data["paths"] += f", {path.points[i].x}, {path.points[i].y}"
+                line += f", {path.points[i].x}, {path.points[i].y}"
 
-            self.data["paths"] += "\n"
+            self.write_other("paths", line)
             self._path_count += 1
 
     def write_line(self, point1, point2):
-        if "paths" not in self.data:
-            self.data["paths"] = ""
+        self.write_other("paths", f"line, {point1[0]}, {point1[1]}, {point2[0]}, {point2[1]}")
 
-        self.data["paths"] += f"line, {point1[0]}, {point1[1]}, {point2[0]}, {point2[1]}\n"
+    def write_walls(self, walls):
+        """
+        Adds walls to paths.txt. They are kept in their compact form and only formatted as the file is written.
+        :param walls: The WallSegments to write.
+        """
+        self.walls.append(walls)
 
     def write_temporary_point(self, time, x: float, y: float):
-        if "points" not in self.data:
-            self.data["points"] = ""
-
-        self.data["points"] += f"{time}, {x:10.2f}, {y:10.2f}\n"
+        self.write_other("points", f"{time}, {x:10.2f}, {y:10.2f}")
 
     def write_other(self, other: str, line):
         if other not in self.data:
-            self.data[other] = ""
-        self.data[other] += line + "\n"
+            self.data[other] = []
+        self.data[other].append(line + "\n")
+
+    def write_output_files(self, trajectory_format: str = "txt"):
+        """
+        Writes everything that has been held in memory to the output folder and closes the trajectory stream.
+        :param trajectory_format: The format for trajectories that were held in memory, "txt" or "npy".
+        """
+        if self.trajectory_stream is not None:
+            self.trajectory_stream.close()
+            print(f"Wrote trajectories to \"{self.trajectory_stream.file_path}\"")
+            self.trajectory_stream = None
+        else:
+            self.create_output_directory()
+
+        if self.trajectory_rows:
+            file_path = f"{self.output_path}/trajectories.{trajectory_format}"
+            if trajectory_format == "npy":
+                from trajectory_io import write_trajectories
+
+                write_trajectories(file_path, self.trajectory_rows)
+            else:
+                with open(file_path, "w+") as file:
+                    file.writelines(OutputManager.format_trajectory(row) for row in self.trajectory_rows)
+            self.trajectory_rows = []
+            print(f"Wrote trajectories to \"{file_path}\"")
 
-    def write_output_files(self):
-        try:
-            os.mkdir(self.output_path)
-            print(f"Created directory \"{self.output_path}\".")
-        except FileExistsError:
-            print(f"Directory \"{self.output_path}\" exists already.")
         # Outputting the trajectories to a file
-        for key in self.data:
+        keys = list(self.data)
+        if self.walls and "paths" not in keys:
+            keys.append("paths")
+        for key in keys:
             file_path = f"{self.output_path}/{key}.txt"
             with open(file_path, "w+") as file:
-                file.write(self.data[key])
+                file.writelines(self.data.get(key, []))
+                if key == "paths":
+                    for walls in self.walls:
+                        file.writelines(walls.format_lines())
             print(f"Wrote {key} to \"{file_path}\"")
 
+    def close(self):
+        """
+        Closes the trajectory stream and lets go of everything that is still held in memory without writing it. If this
+        is the current OutputManager, the one that was current before it is made current again, skipping any that
+        were closed in the meantime.
+        """
+        if self.trajectory_stream is not None:
+            self.trajectory_stream.close()
+            self.trajectory_stream = None
+
+        self.data = {}
+        self.walls = []
+        self.trajectory_rows = []
+
+        self.closed = True
+        OutputManager.get_current()
+
+    def restore_previous(self):
+        """
+        Makes the OutputManager that was current before make_current was called current again.
+        """
+        token, self._token = self._token, None
+        try:
+            current_output_manager.reset(token)
+        except (TypeError, ValueError, RuntimeError):
+            # The token belongs to another context, or is gone, so there is nothing to go back to from here
+            current_output_manager.set(None)
+
 
 if __name__ == '__main__':
     try:
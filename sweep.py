@@ -0,0 +1,186 @@
+"""
+Running a scenario over every combination of a grid of parameters and seeds at once.
+
+The configurations are run by a pool of worker processes. Each one runs in its own folder under the sweep's folder,
+with the random module seeded by its seed. Once a configuration is done its summary metrics are written to summary.json
+in its folder, which is also how an interrupted sweep knows to skip it when it is run again. All of the summaries are
+collected into summary.csv in the sweep's folder.
+
+To run a sweep run "python sweep.py <program> <parameter>=<value>,<value> ... [seeds=<value>,...] [workers=<count>]" in
+command line / terminal, for example "python sweep.py program_2 max_speed=2,4,8 path_offset=0.02,0.04 seeds=0,1,2".
+The parameters are the keyword arguments of the programs in main.py.
+"""
+import contextlib, csv, itertools, json, multiprocessing, os, random, sys, time
+import numpy as np
+
+import main
+import output
+import trajectory_io
+
+# The scenarios that can be swept by name. Each one returns the name of the Simulation it wrote.
+SCENARIOS = {
+    "program_0": main.program_0,
+    "program_1": main.program_1,
+    "program_2": main.program_2,
+}
+
+# The columns of summary.csv that every configuration has, before its parameters and metrics
+SUMMARY_COLUMNS = ("name", "scenario", "seed", "error")
+
+
+def expand_grid(grid):
+    """
+    Returns every combination of the values in a grid of parameters.
+    :param grid: A dict of parameter names to lists of values.
+    :return: A list of dicts of parameter names to values.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def get_configuration_name(parameters, seed):
+    """
+    Returns the name of the folder of a configuration, which is the same every time the sweep is run.
+    """
+    return "_".join([f"{name}={value}" for name, value in parameters.items()] + [f"seed={seed}"])
+
+
+def summarize(file_path):
+    """
+    Computes the summary metrics of a simulation from its trajectories.
+    :param file_path: The trajectories.txt or trajectories.npy of the simulation.
+    """
+    times, movers = trajectory_io.split_by_mover(trajectory_io.read_trajectories(file_path))
+
+    distance, speeds = 0.0, []
+    for records in movers.values():
+        steps = np.hypot(np.diff(records["position_x"]), np.diff(records["position_y"]))
+        distance += float(steps.sum())
+        speeds.append(np.hypot(records["velocity_x"], records["velocity_y"]))
+    speeds = np.concatenate(speeds) if speeds else np.zeros(0)
+
+    return {
+        "ticks": len(times),
+        "movers": len(movers),
+        "distance": distance,
+        "mean_speed": float(speeds.mean()) if speeds.size else 0.0,
+        "max_speed_reached": float(speeds.max()) if speeds.size else 0.0,
+        "collisions": sum(int(records["collision_state"].sum()) for records in movers.values()),
+    }
+
+
+def run_configuration(task):
+    """
+    Runs one configuration of a sweep. This is called in a worker process, which goes on to run other configurations
+    afterwards.
+    :param task: (scenario, parameters, seed, folder)
+    :return: The row of the configuration in the summary table.
+    """
+    scenario, parameters, seed, folder = task
+    row = {"name": os.path.basename(folder), "scenario": scenario, "seed": seed, **parameters}
+
+    # Relative entries of the import path would stop working once the working directory changes
+    sys.path = [os.path.abspath(path) for path in sys.path]
+    os.makedirs(folder, exist_ok=True)
+    os.chdir(folder)
+    random.seed(seed)
+
+    try:
+        start_time = time.time()
+        with open("log.txt", "w") as log, contextlib.redirect_stdout(log):
+            simulation_name = SCENARIOS[scenario](**parameters)
+        row.update(summarize(f"output_data/{simulation_name}/trajectories.txt"))
+        row["runtime"] = time.time() - start_time
+    except Exception as error:
+        # Failed configurations get no summary.json, so they are run again when the sweep is resumed
+        row["error"] = f"{type(error).__name__}: {error}"
+        return row
+    finally:
+        # A program that failed part way through never closed its Simulation, so its output is let go of here
+        manager = output.OutputManager.get_current()
+        if manager is not None:
+            manager.close()
+
+    # Writing the summary all at once, so that a configuration that was interrupted never looks finished
+    with open("summary.json.part", "w") as file:
+        json.dump(row, file)
+    os.replace("summary.json.part", "summary.json")
+    return row
+
+
+def write_summary(file_path, rows):
+    """
+    Writes the summary rows of a sweep as a table, with a column for every parameter and metric any row has.
+    """
+    columns = list(SUMMARY_COLUMNS)
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+
+    with open(file_path, "w", newline="") as file:
+        writer = csv.DictWriter(file, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_sweep(scenario, grid, seeds=(0,), output_path=None, workers=None):
+    """
+    Runs a scenario for every combination of parameters and seeds, skipping the ones a previous run already finished.
+    :param scenario: The name of the scenario in SCENARIOS.
+    :param grid: A dict of parameter names to lists of values.
+    :param seeds: The seeds to run every combination of parameters with.
+    :param output_path: The folder of the sweep. Defaults to output_data/sweep_<scenario>.
+    :param workers: The amount of worker processes. Defaults to the amount of CPUs.
+    :return: The summary rows of every configuration, in the order of the grid.
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError(f"There is no scenario called \"{scenario}\"!")
+    output_path = os.path.abspath(output_path or f"output_data/sweep_{scenario}")
+
+    rows, tasks = {}, []
+    names = []
+    for parameters in expand_grid(grid):
+        for seed in seeds:
+            name = get_configuration_name(parameters, seed)
+            folder = f"{output_path}/{name}"
+            names.append(name)
+
+            if os.path.exists(f"{folder}/summary.json"):
+                with open(f"{folder}/summary.json", "r") as file:
+                    rows[name] = json.load(file)
+            else:
+                tasks.append((scenario, parameters, seed, folder))
+    print(f"Running {len(tasks)} of {len(names)} configurations, the rest are already finished.")
+
+    os.makedirs(output_path, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers) as pool:
+        for finished, row in enumerate(pool.imap_unordered(run_configuration, tasks), 1):
+            rows[row["name"]] = row
+            status = f"failed with {row['error']}" if "error" in row else f"finished in {row['runtime']:.2f}s"
+            print(f"[{finished}/{len(tasks)}] {row['name']} {status}")
+
+    rows = [rows[name] for name in names]
+    write_summary(f"{output_path}/summary.csv", rows)
+    print(f"Wrote the summary of {len(rows)} configurations to \"{output_path}/summary.csv\"")
+    return rows
+
+
+def parse_value(value):
+    for kind in (int, float):
+        try:
+            return kind(value)
+        except ValueError:
+            pass
+    return None if value == "None" else value
+
+
+if __name__ == '__main__':
+    arguments = dict(argument.split("=", 1) for argument in sys.argv[2:])
+    sweep_seeds = [parse_value(seed) for seed in arguments.pop("seeds", "0").split(",")]
+    sweep_workers = parse_value(arguments.pop("workers", "None"))
+    run_sweep(
+        sys.argv[1],
+        {name: [parse_value(value) for value in values.split(",")] for name, values in arguments.items()},
+        sweep_seeds,
+        workers=sweep_workers
+    )
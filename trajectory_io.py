@@ -0,0 +1,197 @@
+"""
+Reading and writing trajectories in a binary format.
+
+Trajectories are stored as a NumPy record array in a .npy file, with one fixed size record per mover per tick. Compared
+to the text format it is much smaller, doesn't need any formatting to write and can be memory-mapped to read it
+without parsing or copying anything.
+
+To convert text trajectories run "python trajectory_io.py <folder or trajectories.txt> ..." in command line / terminal.
+"""
+import io, os, struct, sys
+import numpy as np
+
+# The fields of a trajectory record, in the same order as the columns of trajectories.txt
+TRAJECTORY_DTYPE = np.dtype([
+    ("time", np.float64),
+    ("id", np.int64),
+    ("position_x", np.float64),
+    ("position_y", np.float64),
+    ("velocity_x", np.float64),
+    ("velocity_y", np.float64),
+    ("linear_acceleration_x", np.float64),
+    ("linear_acceleration_y", np.float64),
+    ("orientation", np.float64),
+    ("movement_id", np.int32),
+    ("collision_state", np.bool_),
+])
+
+
+def get_header(count, size=None):
+    """
+    Returns the .npy header of an array of count trajectory records.
+    :param size: How many bytes the header takes up, padded with spaces. Defaults to the smallest multiple of 64 that
+        fits, like NumPy's own headers.
+    """
+    prefix = np.lib.format.MAGIC_PREFIX + bytes([1, 0])
+    text = repr({"descr": np.lib.format.dtype_to_descr(TRAJECTORY_DTYPE), "fortran_order": False, "shape": (count,)})
+    if size is None:
+        size = -(-(len(prefix) + 2 + len(text) + 1) // 64) * 64
+    text = text.ljust(size - len(prefix) - 2 - 1) + "\n"
+    return prefix + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+# The size of the header TrajectoryRecordWriter leaves room for, which fits any amount of records
+HEADER_SIZE = len(get_header(np.iinfo(np.int64).max))
+
+
+def as_collision_state(state):
+    """
+    Converts a collision state as written to trajectories.txt ("TRUE" or "FALSE") to a bool.
+    """
+    if isinstance(state, (str, bytes)):
+        return state.strip().upper() in ("TRUE", b"TRUE")
+    return bool(state)
+
+
+class TrajectoryRecordWriter:
+    """
+    Streams trajectory records into a .npy file.
+
+    Records are collected in a fixed size buffer and appended to the file in chunks. The .npy header needs the final
+    amount of records, so room is left for it at the start of the file and it is filled in when the writer is closed.
+    Until then the file reads as having no records.
+    """
+    def __init__(self, file_path: str, buffer_rows: int = 65536):
+        """
+        :param file_path: The .npy file to write.
+        :param buffer_rows: How many records to collect before writing them out.
+        """
+        self.file_path = file_path
+        self.file = open(file_path, "wb")
+        self.file.write(get_header(0, HEADER_SIZE))
+
+        self.buffer = np.zeros(buffer_rows, dtype=TRAJECTORY_DTYPE)
+        self.buffered = 0
+        self.count = 0
+
+    def write(self, row):
+        """
+        Adds a single record.
+        :param row: A tuple with the same fields as TRAJECTORY_DTYPE. The collision state can be a bool or a string.
+        """
+        self.buffer[self.buffered] = row[:-1] + (as_collision_state(row[-1]),)
+        self.buffered += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def write_records(self, records):
+        """
+        Adds a whole array of records at once.
+        :param records: An array with the dtype TRAJECTORY_DTYPE.
+        """
+        self.flush()
+        records = np.ascontiguousarray(records, dtype=TRAJECTORY_DTYPE)
+        records.tofile(self.file)
+        self.count += len(records)
+
+    def flush(self):
+        if self.buffered:
+            self.buffer[:self.buffered].tofile(self.file)
+            self.count += self.buffered
+            self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.file.seek(0)
+        self.file.write(get_header(self.count, HEADER_SIZE))
+        self.file.close()
+
+
+def write_trajectories(file_path: str, rows):
+    """
+    Writes trajectory rows, as passed to OutputManager.write_trajectory, to a .npy file.
+    """
+    writer = TrajectoryRecordWriter(file_path)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+
+def load_trajectories(file_path: str):
+    """
+    Memory-maps a .npy trajectory file. Nothing is read until the records are used, and nothing is copied.
+    :return: A read-only array with the dtype TRAJECTORY_DTYPE.
+    """
+    return np.load(file_path, mmap_mode="r")
+
+
+def read_text_trajectories(file_path: str):
+    """
+    Parses a trajectories.txt file into an array of records in a single vectorized pass.
+    """
+    with open(file_path, "r") as file:
+        # The collision states are the only column that isn't a number
+        text = file.read().replace("TRUE", "1").replace("FALSE", "0")
+
+    columns = np.loadtxt(io.StringIO(text), delimiter=",", ndmin=2)
+
+    records = np.zeros(len(columns), dtype=TRAJECTORY_DTYPE)
+    for i, name in enumerate(TRAJECTORY_DTYPE.names):
+        records[name] = columns[:, i]
+    return records
+
+
+def read_trajectories(file_path: str):
+    """
+    Reads trajectories from either a .npy file, which is memory-mapped, or a trajectories.txt file.
+    """
+    if file_path.endswith(".npy"):
+        return load_trajectories(file_path)
+    return read_text_trajectories(file_path)
+
+
+def split_by_mover(records):
+    """
+    Splits trajectory records up by mover.
+
+    :param records: An array with the dtype TRAJECTORY_DTYPE.
+    :return: (times, movers), where times is every distinct time in order and movers maps each mover id, in the
+        order they first appear, to an array of its records in time order.
+    """
+    times = np.unique(records["time"])
+
+    ids, first_rows, inverse = np.unique(records["id"], return_index=True, return_inverse=True)
+    order = np.argsort(first_rows, kind="stable")
+
+    # Grouping the rows of each mover together, keeping them in time order within each group
+    rows = np.lexsort((records["time"], inverse))
+    groups = np.split(rows, np.cumsum(np.bincount(inverse, minlength=len(ids)))[:-1])
+
+    movers = {int(ids[i]): records[groups[i]] for i in order}
+    return times, movers
+
+
+def convert_text_trajectories(text_path: str, npy_path: str = None):
+    """
+    Converts a trajectories.txt file to the binary format.
+    :param text_path: The text file, or the folder containing trajectories.txt.
+    :param npy_path: Where to write the .npy file. Defaults to next to the text file.
+    :return: The path of the .npy file.
+    """
+    if os.path.isdir(text_path):
+        text_path = f"{text_path}/trajectories.txt"
+    if npy_path is None:
+        npy_path = f"{os.path.splitext(text_path)[0]}.npy"
+
+    records = read_text_trajectories(text_path)
+    writer = TrajectoryRecordWriter(npy_path)
+    writer.write_records(records)
+    writer.close()
+
+    print(f"Converted {len(records)} records from \"{text_path}\" to \"{npy_path}\"")
+    return npy_path
+
+
+if __name__ == '__main__':
+    for argument in sys.argv[1:]:
+        convert_text_trajectories(argument)